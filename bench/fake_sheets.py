@@ -0,0 +1,132 @@
+from collections import Counter
+
+# Імітація об'єкта spreadsheets() з googleapiclient: зберігає листи в пам'яті
+# і рахує виклики execute() за методами API.
+class _Request:
+    def __init__(self, spreadsheets, method, kwargs):
+        self._spreadsheets = spreadsheets
+        self._method = method
+        self._kwargs = kwargs
+
+    def execute(self):
+        self._spreadsheets.calls[self._method] += 1
+        return getattr(self._spreadsheets, f'_{self._method.replace(".", "_")}')(**self._kwargs)
+
+class _Values:
+    def __init__(self, spreadsheets):
+        self._spreadsheets = spreadsheets
+
+    def __getattr__(self, name):
+        return lambda **kwargs: _Request(self._spreadsheets, f'values.{name}', kwargs)
+
+def _назва_листа(range_name):
+    return range_name.split('!')[0].strip("'")
+
+def _початковий_рядок(range_name):
+    cell = range_name.split('!')[1].split(':')[0] if '!' in range_name else 'A1'
+    digits = ''.join(ch for ch in cell if ch.isdigit())
+    return int(digits) if digits else 1
+
+def _стовпці(range_name):
+    if '!' not in range_name:
+        return 0, None
+    cells = range_name.split('!')[1].split(':')
+    letters = [''.join(ch for ch in cell if ch.isalpha()) for cell in cells]
+    first = ord(letters[0]) - ord('A') if letters[0] else 0
+    last = ord(letters[-1]) - ord('A') + 1 if letters[-1] else None
+    return first, last
+
+class FakeSpreadsheets:
+    def __init__(self, titles=('Articles',)):
+        self.calls = Counter()
+        self.sheets = {}
+        for title in titles:
+            self._додати_лист(title)
+
+    def _додати_лист(self, title):
+        self.sheets[title] = {'sheetId': len(self.sheets), 'rows': [], 'grid': 1000, 'validation': None}
+        return {'title': title, 'sheetId': self.sheets[title]['sheetId'], 'gridProperties': {'rowCount': 1000}}
+
+    def _лист_за_id(self, sheet_id):
+        return next(title for title, sheet in self.sheets.items() if sheet['sheetId'] == sheet_id)
+
+    def get(self, **kwargs):
+        return _Request(self, 'get', kwargs)
+
+    def batchUpdate(self, **kwargs):
+        return _Request(self, 'batchUpdate', kwargs)
+
+    def values(self):
+        return _Values(self)
+
+    def rows(self, title):
+        return self.sheets.get(title, {'rows': []})['rows']
+
+    def _get(self, spreadsheetId, **kwargs):
+        return {'sheets': [{'properties': {'title': title, 'sheetId': sheet['sheetId'],
+                                           'gridProperties': {'rowCount': max(sheet['grid'], len(sheet['rows']))}}}
+                           for title, sheet in self.sheets.items()]}
+
+    def _batchUpdate(self, spreadsheetId, body):
+        replies = []
+        for request in body.get('requests', []):
+            if 'addSheet' in request:
+                replies.append({'addSheet': {'properties': self._додати_лист(request['addSheet']['properties']['title'])}})
+                continue
+            if 'appendCells' in request:
+                rows = self.rows(self._лист_за_id(request['appendCells']['sheetId']))
+                for row in request['appendCells']['rows']:
+                    rows.append([next(iter(cell['userEnteredValue'].values())) for cell in row['values']])
+            if 'deleteDimension' in request:
+                target = request['deleteDimension']['range']
+                sheet = self.sheets[self._лист_за_id(target['sheetId'])]
+                sheet['grid'] = max(sheet['grid'], len(sheet['rows'])) - (target['endIndex'] - target['startIndex'])
+                del sheet['rows'][target['startIndex']:target['endIndex']]
+            if 'appendDimension' in request:
+                self.sheets[self._лист_за_id(request['appendDimension']['sheetId'])]['grid'] += request['appendDimension']['length']
+            if 'setDataValidation' in request and 'rule' in request['setDataValidation']:
+                target = request['setDataValidation']['range']
+                self.sheets[self._лист_за_id(target['sheetId'])]['validation'] = (target['startRowIndex'], target['endRowIndex'])
+            replies.append({})
+        return {'replies': replies}
+
+    def _values_get(self, spreadsheetId, range, **kwargs):
+        return self._values_batchGet(spreadsheetId, ranges=[range])['valueRanges'][0]
+
+    def _values_batchGet(self, spreadsheetId, ranges, **kwargs):
+        value_ranges = []
+        for range_name in ranges:
+            first, last = _стовпці(range_name)
+            rows = self.rows(_назва_листа(range_name))[_початковий_рядок(range_name) - 1:]
+            values = [row[first:last] for row in rows]
+            while values and not values[-1]:
+                values.pop()
+            value_ranges.append({'range': range_name, 'values': values})
+        return {'valueRanges': value_ranges}
+
+    def _values_append(self, spreadsheetId, range, body, **kwargs):
+        self.rows(_назва_листа(range)).extend(body['values'])
+        return {'updates': {'updatedCells': sum(len(row) for row in body['values'])}}
+
+    def _values_update(self, spreadsheetId, range, body, **kwargs):
+        rows = self.rows(_назва_листа(range))
+        start = _початковий_рядок(range) - 1
+        for offset, row in enumerate(body['values']):
+            while len(rows) <= start + offset:
+                rows.append([])
+            rows[start + offset] = row
+        return {'updatedCells': sum(len(row) for row in body['values'])}
+
+    def _values_batchUpdate(self, spreadsheetId, body):
+        for data in body['data']:
+            self._values_update(spreadsheetId, data['range'], {'values': data['values']})
+        return {}
+
+    def _values_clear(self, spreadsheetId, range, **kwargs):
+        self.rows(_назва_листа(range)).clear()
+        return {}
+
+    def _values_batchClear(self, spreadsheetId, body):
+        for range_name in body['ranges']:
+            self._values_clear(spreadsheetId, range_name)
+        return {}
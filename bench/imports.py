@@ -0,0 +1,60 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модулі, які не мають імпортуватися під час завантаження функції: вони
+# потрібні лише тоді, коли запуск справді пише в таблицю, розбирає через bs4
+# або перевіряє й оцінює нові статті (numpy)
+LAZY_MODULES = ['googleapiclient', 'google.auth', 'google.oauth2', 'httplib2', 'bs4', 'numpy']
+
+# Час імпорту точки входу serverless-функції в новому інтерпретаторі (холодний старт).
+#
+#   python -m bench.imports --repeat 5 --top 15
+#   python -m bench.imports --budget 400   # код виходу 1, якщо медіана перевищує бюджет
+
+def виміряти(module):
+    code = f"import sys, {module}; print(','.join(sorted(sys.modules)))"
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    # Рядки -X importtime: "import time: self [us] | cumulative | imported package"
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|', 1).split('|')]
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative, completed.stdout.strip().split(',')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк часу імпорту точки входу")
+    parser.add_argument('--module', default='api.scrape')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=None, help="Допустима медіана, мс")
+    args = parser.parse_args(argv)
+
+    runs = [виміряти(args.module) for _ in range(args.repeat)]
+    totals = [cumulative[args.module] / 1000 for cumulative, _ in runs]
+    median = statistics.median(totals)
+    print(f"{args.module}: медіана {median:.1f} мс, мін {min(totals):.1f} мс, макс {max(totals):.1f} мс ({args.repeat} запусків)")
+
+    cumulative, loaded = runs[-1]
+    top_level = {name: us for name, us in cumulative.items() if '.' not in name and name != args.module}
+    for name, us in sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:>8.1f} мс  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        print(f"Імпортовано під час завантаження, хоча має бути ліниво: {', '.join(eager)}")
+    if eager or (args.budget is not None and median > args.budget):
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
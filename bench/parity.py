@@ -0,0 +1,104 @@
+import argparse
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import sites as sites_module
+from scraper.parsing import отримати_парсер, перевірити_паритет
+
+from bench.server import FIXTURES_DIR, завантажити_фікстури
+
+# Перевірка паритету бекендів розбору: кожен бекенд (lxml, bs4) має давати
+# той самий список посилань і той самий текст статті, що й еталонний розбір
+# BeautifulSoup з html.parser, на записаних сторінках кожного сайту і на
+# крайніх випадках розмітки. Код виходу 1, якщо є хоч одна розбіжність.
+#
+#   python -m bench.parity
+#   python -m bench.parity --sites babel --parser lxml
+
+# Крайні випадки: вставляються і в заголовок посилання списку, і в блок тексту статті
+EDGE_CASES = {
+    'comment': '<p>a<!-- коментар -->b</p>',
+    'script_style': '<p>a</p><script>var x = "<p>y</p>";</script><style>p { color: red }</style><p>b</p>',
+    'template': '<template><p>t</p></template><p>x</p>',
+    'noscript': '<noscript><p>n</p></noscript><p>x</p>',
+    'nbsp': '<p>a&nbsp;b&nbsp;&nbsp;c</p>&nbsp;<p>d</p>',
+    'entities': '<p>&lt;b&gt; &amp; &#x41; &copy; &quot;цитата&quot;</p>',
+    'malformed_nesting': '<p>a<b>b<i>c</b>d</i></p><ul><li>x<li>y</ul><p>z',
+    'unclosed': '<div><p>a<span>b</div>c',
+    'br': '<p>a<br>b<br/>c<br />d</p>',
+    'whitespace': '<p>  a \n\t b  </p>  <p> c </p>\n <p>d</p>',
+    'pre': '<pre>  a\n  b  </pre> <pre> </pre>',
+    'textarea': '<textarea>a<b>b</b></textarea>',
+    'textarea_whitespace': '<textarea>  a  <b> </b> </textarea>',
+    'xmp': '<xmp>a<b>b</b></xmp>',
+    'iframe': '<iframe><p>i</p></iframe><p>x</p>',
+    'noembed': '<noembed><p>i</p></noembed><p>x</p>',
+    'cdata': '<p>a<![CDATA[x]]>b</p>',
+    'processing_instruction': '<p>a<?php echo 1 ?>b</p>',
+    'svg': '<svg><text>s</text><style>x</style></svg>',
+}
+
+# Відомі розбіжності, які паритет не перевіряє, бо з готового дерева lxml
+# відновити розбір html.parser неможливо:
+# - закривальний тег без пари (</p> усередині <div>) html.parser робить межею
+#   між двома рядками, а libxml2 відкидає і зливає текст обабіч ('f g' і 'fg');
+# - застарілий <plaintext> libxml2 поширює на весь решту документа разом із
+#   закривальними тегами, а html.parser закриває його, як звичайний тег.
+KNOWN_DIVERGENCES = {
+    'stray_end_tag': '<p>e<div>f</p>g</div>',
+    'plaintext': '<p>a</p><plaintext>b<c>',
+}
+
+def сторінки(site):
+    # (назва, вид, html) — записані сторінки сайту і крайні випадки в його розмітці
+    fixtures = завантажити_фікстури(site.name)
+    item = fixtures['item']
+    items = ''.join(item.replace('{url}', f'/news/{i}').replace('{title}', f'Новина {i}') for i in range(3))
+    yield 'listing.html', 'listing', fixtures['listing'].replace('{items}', items)
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, site.name, 'listing.recorded.html'))):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            yield os.path.basename(path), 'listing', f.read()
+    for number, article in enumerate(fixtures['articles']):
+        yield f'article-{number}.html', 'article', article.decode('utf-8')
+
+    attrs = ''.join(f' {key}="{value}"' for key, value in site.body_attrs.items())
+    for name, markup in EDGE_CASES.items():
+        # Посилання з розміткою в заголовку і той самий фрагмент у блоці тексту
+        listing = fixtures['listing'].replace('{items}', item.replace('{url}', '/news/edge').replace('{title}', markup))
+        yield f'{name} (список)', 'listing', listing
+        yield f'{name} (стаття)', 'article', f'<html><body><{site.body_tag}{attrs}>{markup}</{site.body_tag}></body></html>'
+
+def перевірити(site_names, backends=('bs4', 'lxml')):
+    # Повертає кількість розбіжностей і друкує кожну
+    failures = 0
+    for backend in backends:
+        parser = отримати_парсер(backend)
+        if parser.name != backend:
+            print(f"{backend}: недоступний, пропущено")
+            continue
+        for site_name in site_names:
+            site = sites_module.SITES[site_name]
+            checked = 0
+            for name, kind, html in сторінки(site):
+                mismatches = перевірити_паритет(site, **{f'{kind}_html': html}, parser=parser)
+                checked += 1
+                for _, expected, actual in mismatches:
+                    failures += 1
+                    print(f"{backend} {site_name} {name}: очікувалося {expected!r}, отримано {actual!r}")
+            print(f"{backend} {site_name}: перевірено {checked} сторінок")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Паритет бекендів розбору на фікстурах і крайніх випадках розмітки")
+    parser.add_argument('--sites', nargs='+', default=sorted(sites_module.SITES), choices=sorted(sites_module.SITES))
+    parser.add_argument('--parser', choices=['bs4', 'lxml'], help="Перевірити лише один бекенд")
+    args = parser.parse_args(argv)
+    failures = перевірити(args.sites, [args.parser] if args.parser else ('bs4', 'lxml'))
+    print(f"Розбіжностей: {failures}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
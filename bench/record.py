@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import engine
+from scraper.sites import SITES
+
+from bench.server import FIXTURES_DIR
+
+# Записує живі сторінки сайту у bench/fixtures/<сайт>/: список новин як
+# listing.recorded.html (для перевірки паритету) і перші статті як article-N.html.
+#
+#   python -m bench.record babel --articles 5
+
+async def записати(site, count):
+    directory = os.path.join(FIXTURES_DIR, site.name)
+    os.makedirs(directory, exist_ok=True)
+    async with engine.створити_сесію() as session:
+        async with session.get(site.listing_url) as response:
+            listing = await response.read()
+        with open(os.path.join(directory, 'listing.recorded.html'), 'wb') as f:
+            f.write(listing)
+        articles = engine.розібрати_статті(site, listing.decode('utf-8', errors='replace'))[:count]
+        for i, article in enumerate(articles):
+            async with session.get(article['url']) as response:
+                body = await response.read()
+            with open(os.path.join(directory, f'article-{i}.html'), 'wb') as f:
+                f.write(body)
+            print(f"{site.name}: {article['url']} -> article-{i}.html ({len(body)} байт)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Записати сторінки сайту як фікстури для бенчмарку")
+    parser.add_argument('sites', nargs='+', choices=sorted(SITES))
+    parser.add_argument('--articles', type=int, default=3)
+    args = parser.parse_args(argv)
+    for name in args.sites:
+        asyncio.run(записати(SITES[name], args.articles))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import archive, engine, resilience, state, storage
+from scraper import sites as sites_module
+from scraper.parsing import отримати_парсер
+
+from bench import parity
+from bench.fake_sheets import FakeSpreadsheets
+from bench.server import FixtureServer
+
+# Офлайн-бенчмарк скрапінгу: записані сторінки віддає локальний сервер, а
+# Google Sheets замінено на FakeSpreadsheets у пам'яті.
+#
+#   python -m bench.run --sizes 10 100 1000 --parser lxml --concurrency 8
+#   python -m bench.run --parity
+
+def етапи(metrics):
+    # Сумарний час етапів з метрик запуску, які повертає engine.скрапінг()
+    stages = {stage: timer['seconds'] for stage, timer in metrics['stages'].items()}
+    return {
+        'fetch': stages.get('fetch_listing', 0.0) + stages.get('fetch_article', 0.0),
+        'parse': stages.get('parse_listing', 0.0) + stages.get('parse_article', 0.0),
+        'dedup': stages.get('dedup', 0.0) + stages.get('dedup_sync', 0.0),
+        'write': stages.get('write', 0.0),
+        'mirror': stages.get('mirror', 0.0),
+    }
+
+async def один_запуск(server, site_names, size, measure_memory=False, no_news=False, compact=False):
+    server.articles_count = size
+    server.bytes_sent = 0
+    sheets = FakeSpreadsheets()
+    storage.налаштувати_sheets = lambda: sheets
+    with tempfile.TemporaryDirectory() as state_dir:
+        state.STATE_DIR = state_dir
+        if measure_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        response = json.loads(await engine.скрапінг(site_names))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+        if measure_memory:
+            tracemalloc.stop()
+        articles = len(sheets.rows('Articles'))
+        api_calls = dict(sheets.calls)
+        if no_news:
+            # Повторний запуск з тим самим станом: список новин не змінився,
+            # тож не має бути ні розбору, ні жодного запиту до Sheets
+            calls_before = sum(sheets.calls.values())
+            start = time.perf_counter()
+            json.loads(await engine.скрапінг(site_names))
+            no_news_seconds = time.perf_counter() - start
+            no_news_calls = sum(sheets.calls.values()) - calls_before
+        if compact:
+            # Ущільнення через ту саму точку входу, що й cron: від'ємний вік
+            # переносить в архів усі щойно записані рядки
+            start = time.perf_counter()
+            compacted = json.loads(await archive.ущільнення(site_names, max_age_days=-1, target='sheets'))
+            compact_seconds = time.perf_counter() - start
+            if 'error' in compacted:
+                raise RuntimeError(compacted['error'])
+            compact_rows = sum(compacted['sheets'].values())
+
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+    return {
+        'size': size,
+        'sites': len(site_names),
+        'articles': articles,
+        'seconds': elapsed,
+        'articles_per_second': articles / elapsed if elapsed else 0.0,
+        'stages': етапи(response['metrics']),
+        'counters': response['metrics']['counters'],
+        'api_calls': api_calls,
+        'api_calls_total': sum(api_calls.values()),
+        'bytes_downloaded': server.bytes_sent,
+        'peak_memory_mb': peak / 2**20 if peak is not None else None,
+        'no_news_seconds': no_news_seconds if no_news else None,
+        'no_news_api_calls': no_news_calls if no_news else None,
+        'compact_seconds': compact_seconds if compact else None,
+        'compact_rows': compact_rows if compact else None,
+    }
+
+async def бенчмарк(args):
+    engine.CONCURRENCY = args.concurrency
+    resilience.HOST_RATE = args.host_rate
+    engine.PARSER = отримати_парсер(args.parser)
+    engine.EXTRACT_EXECUTOR = args.executor
+    storage.STORAGE = args.storage
+    os.environ['SPREADSHEET_ID'] = 'bench'
+    server = await FixtureServer(args.sites, latency=args.latency / 1000).start()
+    for name in args.sites:
+        sites_module.SITES[name] = dataclasses.replace(
+            sites_module.SITES[name], listing_url=server.url_списку(name), base_url=server.base_url)
+    results = []
+    try:
+        # Масштабування розбору: той самий прохід для кожної кількості воркерів пулу
+        for workers in args.workers or [engine.EXTRACT_WORKERS]:
+            engine.EXTRACT_WORKERS = workers
+            for size in args.sizes:
+                result = await один_запуск(server, args.sites, size, no_news=args.no_news, compact=args.compact)
+                if not args.no_memory:
+                    result['peak_memory_mb'] = (await один_запуск(server, args.sites, size, measure_memory=True))['peak_memory_mb']
+                result['workers'] = workers
+                results.append(result)
+    finally:
+        await server.stop()
+    return results
+
+def надрукувати(results, args):
+    print(f"storage={storage.STORAGE} parser={engine.PARSER.name} concurrency={args.concurrency} executor={engine.EXTRACT_EXECUTOR} "
+          f"cores={engine.доступні_ядра()} latency={args.latency}ms sites={','.join(args.sites)}")
+    print(f"{'workers':>7} {'size':>6} {'articles':>8} {'sec':>7} {'art/s':>8} {'fetch':>7} {'parse':>7} {'dedup':>7} {'write':>7} {'calls':>6} {'MB':>7} {'peak MB':>8}"
+          + (f" {'no-news s':>9} {'calls':>5}" if args.no_news else '')
+          + (f" {'compact s':>9} {'rows':>6}" if args.compact else ''))
+    for r in results:
+        stages = r['stages']
+        peak = f"{r['peak_memory_mb']:.1f}" if r['peak_memory_mb'] is not None else '-'
+        print(f"{r['workers']:>7} {r['size']:>6} {r['articles']:>8} {r['seconds']:>7.3f} {r['articles_per_second']:>8.1f} "
+              f"{stages['fetch']:>7.3f} {stages['parse']:>7.3f} {stages['dedup']:>7.3f} {stages['write']:>7.3f} "
+              f"{r['api_calls_total']:>6} {r['bytes_downloaded'] / 2**20:>7.1f} {peak:>8}"
+              + (f" {r['no_news_seconds']:>9.3f} {r['no_news_api_calls']:>5}" if args.no_news else '')
+              + (f" {r['compact_seconds']:>9.3f} {r['compact_rows']:>6}" if args.compact else ''))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк скрапінгу на записаних сторінках")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--sites', nargs='+', default=['babel'], choices=sorted(sites_module.SITES))
+    parser.add_argument('--parser', default=engine.PARSER.name, choices=['bs4', 'lxml'])
+    parser.add_argument('--concurrency', type=int, default=engine.CONCURRENCY)
+    parser.add_argument('--storage', default=storage.STORAGE, choices=['sheets', 'sqlite'],
+                        help="Сховище статей (sqlite — локальна база з дзеркалом у FakeSpreadsheets)")
+    parser.add_argument('--executor', default=engine.EXTRACT_EXECUTOR, choices=['thread', 'process'], help="Пул розбору тексту статей")
+    parser.add_argument('--workers', type=int, nargs='+', help="Кількості воркерів пулу розбору для порівняння")
+    parser.add_argument('--host-rate', type=float, default=10000.0, help="Ліміт запитів на хост за секунду")
+    parser.add_argument('--latency', type=float, default=0.0, help="Затримка відповіді на статтю, мс")
+    parser.add_argument('--no-memory', action='store_true', help="Не вимірювати пікову пам'ять (окремий прохід з tracemalloc)")
+    parser.add_argument('--no-news', action='store_true', help="Після кожного розміру виміряти повторний запуск без нових статей")
+    parser.add_argument('--compact', action='store_true', help="Після кожного розміру виміряти ущільнення всіх записаних рядків")
+    parser.add_argument('--json', action='store_true', help="Вивести результати як JSON")
+    parser.add_argument('--parity', action='store_true', help="Лише перевірити паритет бекендів розбору (див. bench.parity)")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    if args.parity:
+        return 1 if parity.перевірити(args.sites) else 0
+
+    results = asyncio.run(бенчмарк(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        надрукувати(results, args)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
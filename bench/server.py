@@ -0,0 +1,70 @@
+import asyncio
+import glob
+import os
+
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def завантажити_фікстури(site_name):
+    directory = os.path.join(FIXTURES_DIR, site_name)
+    with open(os.path.join(directory, 'listing.html'), encoding='utf-8') as f:
+        listing = f.read()
+    with open(os.path.join(directory, 'item.html'), encoding='utf-8') as f:
+        item = f.read()
+    articles = []
+    for path in sorted(glob.glob(os.path.join(directory, 'article-*.html'))):
+        with open(path, 'rb') as f:
+            articles.append(f.read())
+    return {'listing': listing, 'item': item, 'articles': articles}
+
+# Локальний сервер, що віддає записані сторінки замість babel.ua і apostrophe.ua.
+# Список новин генерується з шаблонів listing.html/item.html на потрібну кількість
+# статей, а статті по колу беруться з article-*.html.
+class FixtureServer:
+    def __init__(self, site_names, latency=0.0):
+        self.fixtures = {name: завантажити_фікстури(name) for name in site_names}
+        self.latency = latency
+        self.articles_count = 0
+        self.bytes_sent = 0
+        self.base_url = None
+        self._runner = None
+
+    def url_списку(self, site_name):
+        return f"{self.base_url}/{site_name}/news"
+
+    def _список(self, site_name):
+        fixtures = self.fixtures[site_name]
+        items = ''.join(
+            fixtures['item'].replace('{url}', f"{self.base_url}/{site_name}/article/{i}").replace('{title}', f"Новина {i}")
+            for i in range(self.articles_count)
+        )
+        return fixtures['listing'].replace('{items}', items).encode('utf-8')
+
+    async def _обробити_список(self, request):
+        body = self._список(request.match_info['site'])
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type='text/html', charset='utf-8')
+
+    async def _обробити_статтю(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        articles = self.fixtures[request.match_info['site']]['articles']
+        body = articles[int(request.match_info['i']) % len(articles)]
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type='text/html', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/{site}/news', self._обробити_список)
+        app.router.add_get('/{site}/article/{i}', self._обробити_статтю)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def stop(self):
+        await self._runner.cleanup()
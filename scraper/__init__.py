@@ -0,0 +1,4 @@
+from .sites import SiteAdapter, SITES, вибрати_сайти
+from .engine import скрапінг
+from .backfill import дозавантаження
+from .handler import створити_обробник
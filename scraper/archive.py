@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from .dedup import DEDUP_HEADER, DEDUP_SHEET, DedupIndex, ключ_url, рядки_ключів
+from .engine import ARTICLES_HEADER, PROCESSED_HEADER
+from .metrics import запуск, записати_підсумок, лічильник, у_потоці
+from .sheets import (
+    VALIDATION_ROWS, запит_випадаючого_списку, запит_зняття_списку, запит_видалення_рядків, запит_додавання_рядків,
+)
+from .sites import вибрати_сайти
+from .storage import відкрити_сховище, після_запуску, записати_файл
+from .state import STATE_DIR
+
+# Ущільнення таблиці: рядки Articles зі статусом з ARCHIVE_STATUSES або
+# старші за ARCHIVE_MAX_AGE_DAYS днів (за колонкою «Додано») переносяться в
+# архів за місяцями, а з листів оброблених — рядки старші за той самий строк,
+# чиїх статей уже немає в Articles. Ключі перенесених статей лишаються в
+# листі Dedup, тож індекс дублікатів їх не забуває, а читання й дописування
+# живих листів не сповільнюються з часом.
+#
+# Архів (ARCHIVE_TARGET): 'sheets' — листи «Articles 2024-05» у тій самій
+# таблиці, 'jsonl' — файли .jsonl.gz в ARCHIVE_DIR, 'parquet' — файли Parquet
+# (потрібен pyarrow). На Vercel локальні файли живуть лише в /tmp, тож там
+# придатний тільки 'sheets'.
+ARCHIVE_MAX_AGE_DAYS = float(os.environ.get('SCRAPE_ARCHIVE_MAX_AGE_DAYS', 14))
+ARCHIVE_STATUSES = ("Опубліковано", "Забраковано")
+ARCHIVE_TARGET = os.environ.get('SCRAPE_ARCHIVE_TARGET', 'sheets')
+ARCHIVE_DIR = os.environ.get('SCRAPE_ARCHIVE_DIR', os.path.join(STATE_DIR, 'archive'))
+
+STATUS_COLUMN = 1
+LINK_COLUMN = 2
+# Номер колонки «Додано» в кожному з листів
+ARTICLES_ADDED_COLUMN = ARTICLES_HEADER.index("Додано")
+PROCESSED_ADDED_COLUMN = PROCESSED_HEADER.index("Додано")
+
+def _клітинка(row, column):
+    return row[column] if len(row) > column else ""
+
+def _діапазони(positions):
+    # Суцільні діапазони номерів рядків [start, end), від останнього до першого,
+    # щоб видалення одного не зсувало наступні
+    ranges = []
+    for position in sorted(positions):
+        if ranges and ranges[-1][1] == position:
+            ranges[-1][1] = position + 1
+        else:
+            ranges.append([position, position + 1])
+    return reversed(ranges)
+
+def _місяць(added, today):
+    return added[:7] if len(added) >= 7 else today.isoformat()[:7]
+
+class Compaction:
+    # План ущільнення одного листа: які рядки лишаються і що куди переноситься
+    def __init__(self, name, header, rows):
+        self.name = name
+        self.header = header
+        self.has_header = bool(rows) and rows[0][:1] == header[:1]
+        self.rows = rows
+        self.archived = []
+        self.by_month = {}
+
+    def перенести(self, position, month):
+        self.archived.append(position)
+        self.by_month.setdefault(month, []).append(self.rows[position])
+
+    def записи(self):
+        # Рядки даних (без заголовка) з їхніми номерами в листі
+        return enumerate(self.rows[1:] if self.has_header else self.rows, start=1 if self.has_header else 0)
+
+    @property
+    def live_rows(self):
+        return len(self.rows) - len(self.archived)
+
+def спланувати(articles, processed, sites, max_age_days, today):
+    cutoff = (today - timedelta(days=max_age_days)).isoformat()
+
+    plan = Compaction('Articles', ARTICLES_HEADER, articles)
+    live = set()
+    for position, row in plan.записи():
+        added = _клітинка(row, ARTICLES_ADDED_COLUMN)
+        # Рядки без дати (записані до появи колонки) переносяться лише за статусом
+        if _клітинка(row, STATUS_COLUMN) in ARCHIVE_STATUSES or (added and added < cutoff):
+            plan.перенести(position, _місяць(added, today))
+        elif _клітинка(row, LINK_COLUMN):
+            live.add(ключ_url(row[LINK_COLUMN]))
+
+    plans = [plan]
+    archived_keys = {}
+    for site, rows in zip(sites, processed):
+        site_plan = Compaction(site.processed_sheet, PROCESSED_HEADER, rows)
+        for position, row in site_plan.записи():
+            url = _клітинка(row, LINK_COLUMN)
+            added = _клітинка(row, PROCESSED_ADDED_COLUMN)
+            if (url and ключ_url(url) in live) or (added and added >= cutoff):
+                continue
+            site_plan.перенести(position, _місяць(added, today))
+            if url:
+                archived_keys.setdefault(site.name, []).append(ключ_url(url))
+        plans.append(site_plan)
+    return plans, archived_keys
+
+def записати_файли(plans, target, directory=None):
+    # Локальний архів записується до видалення рядків з таблиці: обірване
+    # ущільнення дасть щонайбільше повторні записи в архіві, а не втрату рядків
+    directory = directory or ARCHIVE_DIR
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for plan in plans:
+        for month, rows in plan.by_month.items():
+            # JSONL за місяць — один файл, що дописується; Parquet — файл на кожне ущільнення
+            name = f'{plan.name}-{month}' + (f'-{int(time.time())}' if target == 'parquet' else '')
+            paths.append(записати_файл(os.path.join(directory, name), plan.header, rows, target))
+    return paths
+
+def запити_ущільнення(writer, plans):
+    # Видалення перенесених рядків (у межах одного batchUpdate разом із записом
+    # в архівні листи) і випадаючий список статусів лише на живому діапазоні
+    requests = []
+    sheet_ids = writer.ідентифікатори_листів()
+    for plan in plans:
+        for start, end in _діапазони(plan.archived):
+            requests.append(запит_видалення_рядків(sheet_ids[plan.name], start, end))
+    articles = plans[0]
+    grid_rows = writer.кількість_рядків('Articles') - len(articles.archived)
+    end_row = articles.live_rows + VALIDATION_ROWS
+    if grid_rows < end_row:
+        requests.append(запит_додавання_рядків(sheet_ids['Articles'], end_row - grid_rows))
+    requests.append(запит_випадаючого_списку(sheet_ids['Articles'], 1, end_row))
+    if grid_rows > end_row:
+        requests.append(запит_зняття_списку(sheet_ids['Articles'], end_row))
+    return requests
+
+def ущільнити(writer, index, sites, max_age_days=None, target=None, today=None):
+    max_age_days = ARCHIVE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    target = target or ARCHIVE_TARGET
+    today = today or date.today()
+
+    # Спершу індекс дублікатів дочитує все, що є в листах оброблених, щоб
+    # ключі перенесених статей точно лишилися в ньому
+    prepare = getattr(writer, 'підготувати_ущільнення', None)
+    if prepare is not None:
+        prepare()
+    index.синхронізувати(writer, sites)
+    archived_rows = index.рядків_архіву(writer)
+    articles, *processed = writer.прочитати(['Articles!A:H'] + [f'{site.processed_sheet}!A:D' for site in sites])
+    plans, archived_keys = спланувати(articles, processed, sites, max_age_days, today)
+    if not any(plan.archived for plan in plans):
+        logging.info("Ущільнення: немає рядків для перенесення")
+        return {plan.name: 0 for plan in plans}, []
+
+    rows_by_sheet = {}
+    paths = []
+    if target == 'sheets':
+        for plan in plans:
+            for month, rows in plan.by_month.items():
+                archive_name = f'{plan.name} {month}'
+                if archive_name not in writer.ідентифікатори_листів():
+                    rows = [plan.header] + rows
+                rows_by_sheet[archive_name] = rows
+    else:
+        paths = записати_файли(plans, target)
+    dedup_rows = [row for site_name, keys in archived_keys.items() for row in рядки_ключів(site_name, keys, today.isoformat())]
+    if dedup_rows:
+        rows_by_sheet[DEDUP_SHEET] = dedup_rows if archived_rows else [DEDUP_HEADER] + dedup_rows
+
+    writer.забезпечити_листи(list(rows_by_sheet))
+    writer.записати(rows_by_sheet, запити_ущільнення(writer, plans))
+
+    # Номери рядків листів оброблених змінилися: індекс цього процесу знає
+    # нові розміри, інші побачать нові рядки Dedup і перечитають листи
+    for site, plan in zip(sites, plans[1:]):
+        index.встановити_рядки(site.name, f'{writer.spreadsheet_id}/{site.processed_sheet}', plan.live_rows)
+    if DEDUP_SHEET in rows_by_sheet:
+        index.встановити_рядки(DEDUP_SHEET, f'{writer.spreadsheet_id}/{DEDUP_SHEET}',
+                               archived_rows + len(rows_by_sheet[DEDUP_SHEET]))
+    moved = {}
+    for plan in plans:
+        moved[plan.name] = len(plan.archived)
+        лічильник('rows_archived', len(plan.archived))
+        logging.info(f"Ущільнення {plan.name}: перенесено {len(plan.archived)}, лишилося {plan.live_rows} рядків")
+    return moved, paths
+
+def _ущільнити_з_індексом(writer, sites, max_age_days, target):
+    # З'єднання SQLite індексу прив'язане до потоку, тож індекс відкривається
+    # в тому самому потоці пулу, де виконується ущільнення
+    with DedupIndex() as index:
+        return ущільнити(writer, index, sites, max_age_days, target)
+
+async def ущільнення(site_names=None, max_age_days=None, target=None, runtime=None):
+    start_time = datetime.now()
+    with запуск() as run_metrics:
+        try:
+            sites = вибрати_сайти(site_names)
+            with відкрити_сховище() as writer:
+                moved, paths = await у_потоці(None, _ущільнити_з_індексом, writer, sites, max_age_days, target)
+                await після_запуску(writer, runtime)
+        except Exception as e:
+            logging.error(f"Помилка ущільнення: {e}")
+            response = {"error": str(e)}
+        else:
+            logging.info(f"Ущільнення завершено за {(datetime.now() - start_time).total_seconds():.2f} с, "
+                         f"запитів до Sheets: {writer.api_calls}")
+            response = {"message": f"Перенесено в архів {sum(moved.values())} рядків.", "sheets": moved}
+            if paths:
+                response["files"] = paths
+    response['metrics'] = run_metrics.підсумок()
+    записати_підсумок(response['metrics'], 'compact')
+    return json.dumps(response, ensure_ascii=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перенесення старих і оброблених рядків таблиці в архів")
+    parser.add_argument('sites', nargs='*', default=['all'])
+    parser.add_argument('--max-age', type=float, help="Вік рядків у днях (за замовчуванням SCRAPE_ARCHIVE_MAX_AGE_DAYS)")
+    parser.add_argument('--target', choices=['sheets', 'jsonl', 'parquet'], help="Куди переносити рядки")
+    args = parser.parse_args(argv)
+    print(asyncio.run(ущільнення(args.sites, args.max_age, args.target)))
+
+if __name__ == '__main__':
+    main()
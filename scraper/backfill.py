@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from . import engine
+from .cache import ArticleCache
+from .dedup import DedupIndex
+from .metrics import запуск, записати_підсумок, у_потоці
+from .neardup import відкрити_індекс
+from .relevance import відкрити_оцінювач
+from .parsing import декодувати
+from .resilience import RetryQueue
+from .sites import вибрати_сайти
+from .state import шлях_стану
+from .storage import відкрити_сховище, після_запуску
+
+# Скільки сторінок архіву завантажувати одночасно, після скількох сторінок
+# поспіль лише з відомими статтями зупинятися, межа сторінок і час на один
+# виклик (менше за ліміт serverless-функції, щоб встигнути записати порцію)
+BACKFILL_WINDOW = int(os.environ.get('SCRAPE_BACKFILL_WINDOW', 4))
+BACKFILL_KNOWN_PAGES = int(os.environ.get('SCRAPE_BACKFILL_KNOWN_PAGES', 3))
+BACKFILL_MAX_PAGES = int(os.environ.get('SCRAPE_BACKFILL_MAX_PAGES', 500))
+BACKFILL_TIME_BUDGET = float(os.environ.get('SCRAPE_BACKFILL_TIME_BUDGET', 40))
+
+# Контрольна точка дозавантаження сайту. У режимі сторінок position — номер
+# наступної сторінки списку, у режимі архіву за днями — наступна дата (ISO).
+# Точка зберігається лише після запису всіх статей вікна, тож обірваний
+# виклик повторить щонайбільше одне вікно, а дублікати відсіє індекс.
+class BackfillCheckpoint:
+    def __init__(self, site_name, mode, until=None, known_pages=None):
+        self.path = шлях_стану(f'backfill_{site_name}.json')
+        self.site_name = site_name
+        self.mode = mode
+        self.until = until
+        # 0 вимикає зупинку на відомих сторінках (повне завантаження історії)
+        self.known_pages = BACKFILL_KNOWN_PAGES if known_pages is None else known_pages
+        self.position = 1 if mode == 'pages' else date.today().isoformat()
+        self.known_run = 0
+        self.added = 0
+        self.done = False
+
+    @classmethod
+    def завантажити(cls, site_name, mode, until=None, restart=False, known_pages=None):
+        checkpoint = cls(site_name, mode, until, known_pages)
+        if restart:
+            return checkpoint
+        try:
+            with open(checkpoint.path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return checkpoint
+        # Інший режим чи межа — це нове завдання, стару точку не продовжуємо
+        if saved.get('mode') == mode and saved.get('until') == until:
+            checkpoint.position = saved['position']
+            checkpoint.known_run = saved['known_run']
+            checkpoint.added = saved['added']
+            checkpoint.done = saved['done']
+        return checkpoint
+
+    def зберегти(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'mode': self.mode, 'until': self.until, 'position': self.position,
+                'known_run': self.known_run, 'added': self.added, 'done': self.done,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def наступні_сторінки(self, site, count):
+        if self.mode == 'pages':
+            last = min(self.position + count, BACKFILL_MAX_PAGES + 1)
+            return [(page, site.page_url_template.format(page=page)) for page in range(self.position, last)]
+        current = date.fromisoformat(self.position)
+        until = date.fromisoformat(self.until)
+        days = []
+        while current >= until and len(days) < count:
+            days.append((current.isoformat(), site.archive_url_template.format(date=current)))
+            current -= timedelta(days=1)
+        return days
+
+    def перейти_далі(self, last_key):
+        if self.mode == 'pages':
+            self.position = last_key + 1
+            self.done = self.done or self.position > BACKFILL_MAX_PAGES
+        else:
+            self.position = (date.fromisoformat(last_key) - timedelta(days=1)).isoformat()
+            self.done = self.done or self.position < self.until
+
+def режим(site, until):
+    # Списки новин не містять дат, тож зупинитися на даті можна лише в
+    # архіві за днями; для інших сайтів until — помилка, а не тихий обхід сторінок
+    if until:
+        if not site.archive_url_template:
+            raise ValueError(f"Сайт {site.name} не має архіву за днями, дозавантаження до дати {until} неможливе")
+        return 'dates'
+    if site.page_url_template:
+        return 'pages'
+    raise ValueError(f"Для сайту {site.name} не задано шаблон сторінок архіву")
+
+async def вікно_статей(session, site, index, checkpoint, limiter):
+    pages = checkpoint.наступні_сторінки(site, BACKFILL_WINDOW)
+    if not pages:
+        checkpoint.done = True
+        return [], None
+    contents = await asyncio.gather(*(engine.завантажити_статтю(session, url, limiter) for _, url in pages))
+
+    articles = []
+    last_key = None
+    for (key, url), (body, charset, _, _) in zip(pages, contents):
+        last_key = key
+        parsed = engine.розібрати_статті(site, декодувати(body, charset) if body else '')
+        if not parsed and checkpoint.mode == 'pages':
+            # Порожня сторінка — кінець архіву
+            logging.info(f"[{site.name}] Сторінка {key} порожня, дозавантаження завершено")
+            checkpoint.done = True
+            break
+        if parsed and all(index.містить(site.name, article['url']) for article in parsed):
+            checkpoint.known_run += 1
+        else:
+            checkpoint.known_run = 0
+        articles.extend(parsed)
+        if checkpoint.mode == 'pages' and checkpoint.known_pages and checkpoint.known_run >= checkpoint.known_pages:
+            logging.info(f"[{site.name}] {checkpoint.known_run} сторінок поспіль без нових статей, дозавантаження завершено")
+            checkpoint.done = True
+            break
+    return engine.відібрати_нові(site, articles, index), last_key
+
+async def дозавантажити_сайт(session, site, index, retry_queue, cache, executor, limiter, flusher, checkpoint, deadline):
+    while not checkpoint.done and time.monotonic() < deadline:
+        articles, last_key = await вікно_статей(session, site, index, checkpoint, limiter)
+        if last_key is None:
+            break
+
+        async def produce(_):
+            return articles
+
+        pipeline = engine.створити_конвеєр(
+            produce=produce,
+            fetch=lambda site, article: engine.отримати_або_відкласти(session, site, article, retry_queue, executor, limiter, cache),
+            flush=flusher,
+            sites=[site],
+        )
+        written = (await pipeline.run([site]))[site.name]
+        checkpoint.added += written
+        checkpoint.перейти_далі(last_key)
+        checkpoint.зберегти()
+        logging.info(f"[{site.name}] Дозавантаження: позиція {checkpoint.position}, додано {checkpoint.added} статей")
+    return checkpoint
+
+async def дозавантаження(site_names=None, until=None, restart=False, time_budget=None, known_pages=None, runtime=None):
+    start_time = datetime.now()
+    deadline = time.monotonic() + (time_budget or BACKFILL_TIME_BUDGET)
+    logging.info(f"Дозавантаження архіву розпочато{f' до {until}' if until else ''}.")
+    with запуск() as run_metrics:
+        try:
+            response = await _дозавантаження(site_names, until, restart, deadline, known_pages, runtime)
+        except Exception as e:
+            logging.error(f"Виникла помилка: {str(e)}")
+            response = {"error": str(e)}
+    logging.info(f"Дозавантаження за {(datetime.now() - start_time).total_seconds():.2f} с: {response}")
+    response['metrics'] = run_metrics.підсумок()
+    записати_підсумок(response['metrics'], 'backfill')
+    return json.dumps(response)
+
+async def _дозавантаження(site_names, until, restart, deadline, known_pages, runtime):
+    if until:
+        date.fromisoformat(until)
+    sites = вибрати_сайти(site_names)
+    checkpoints = [BackfillCheckpoint.завантажити(site.name, режим(site, until), until, restart, known_pages)
+                   for site in sites]
+    with відкрити_сховище() as writer, DedupIndex() as index, RetryQueue() as retry_queue, ArticleCache() as cache, \
+            відкрити_індекс() as near_dups, відкрити_оцінювач() as scorer:
+        await у_потоці(None, engine.підготувати_індекс, writer, index, sites)
+        flusher = engine.SheetFlusher(writer, index, retry_queue, sites, near_dups=near_dups, scorer=scorer)
+        async with engine.ресурси_запуску(runtime) as (session, executor, limiter):
+            results = await asyncio.gather(
+                *(дозавантажити_сайт(session, site, index, retry_queue, cache, executor, limiter, flusher, checkpoint, deadline)
+                  for site, checkpoint in zip(sites, checkpoints)),
+                return_exceptions=True
+            )
+        await після_запуску(writer, runtime)
+
+    outcome = {}
+    for site, result in zip(sites, results):
+        if isinstance(result, Exception):
+            logging.error(f"[{site.name}] Виникла помилка: {result}")
+            outcome[site.name] = {"error": str(result)}
+            continue
+        status = "завершено" if result.done else "триває, викличте ще раз"
+        outcome[site.name] = {
+            "message": f"Дозавантаження {status}. Додано {result.added} статей.",
+            "position": result.position,
+            "done": result.done,
+        }
+    if len(sites) == 1:
+        return outcome[sites[0].name]
+    return {"sites": outcome}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Дозавантаження архіву новин з контрольними точками")
+    parser.add_argument('sites', nargs='*', default=['all'])
+    parser.add_argument('--until', help="Дата YYYY-MM-DD, до якої йти архівом за днями (лише для сайтів з archive_url_template)")
+    parser.add_argument('--restart', action='store_true', help="Почати з початку, ігноруючи контрольну точку")
+    parser.add_argument('--time-budget', type=float, default=None, help="Секунд на виклик")
+    parser.add_argument('--known-pages', type=int, default=None,
+                        help="Зупинитися після стількох сторінок поспіль без нових статей (0 — не зупинятися)")
+    args = parser.parse_args(argv)
+    print(asyncio.run(дозавантаження(args.sites, args.until, args.restart, args.time_budget, args.known_pages)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+from .dedup import ключ_url
+from .metrics import лічильник
+from .state import шлях_стану
+
+# Максимальний розмір кешу (стиснені тексти), вік, до якого запис вважається
+# свіжим і береться без запиту до сайту, і скільки звільняти при витісненні
+CACHE_MAX_BYTES = int(os.environ.get('SCRAPE_CACHE_MAX_BYTES', 64 * 2**20))
+CACHE_TTL = float(os.environ.get('SCRAPE_CACHE_TTL', 7 * 24 * 3600))
+EVICT_TO = 0.9
+
+class CachedArticle:
+    def __init__(self, text, etag, last_modified, stored_at):
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    @property
+    def свіжа(self):
+        return time.time() - self.stored_at < CACHE_TTL
+
+    def заголовки(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+# Кеш витягнутого тексту статей на диску: ключ — хеш нормалізованого URL,
+# текст стиснений zlib, витіснення за LRU, коли розмір перевищує CACHE_MAX_BYTES.
+class ArticleCache:
+    def __init__(self, path=None, max_bytes=None):
+        self.max_bytes = max_bytes or CACHE_MAX_BYTES
+        self.conn = sqlite3.connect(path or шлях_стану('article_cache.sqlite3'), timeout=30)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS articles (
+                key BLOB PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                body BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS articles_accessed_at ON articles (accessed_at);
+        ''')
+        self._total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM articles').fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def отримати(self, url):
+        row = self.conn.execute(
+            'SELECT etag, last_modified, stored_at, body FROM articles WHERE key = ?', (ключ_url(url),)).fetchone()
+        if row is None:
+            self.misses += 1
+            лічильник('cache_misses')
+            return None
+        self.hits += 1
+        лічильник('cache_hits')
+        with self.conn:
+            self.conn.execute('UPDATE articles SET accessed_at = ? WHERE key = ?', (time.time(), ключ_url(url)))
+        etag, last_modified, stored_at, body = row
+        return CachedArticle(zlib.decompress(body).decode('utf-8'), etag, last_modified, stored_at)
+
+    def підтвердити(self, url):
+        # Сайт відповів 304: запис знову свіжий
+        now = time.time()
+        with self.conn:
+            self.conn.execute('UPDATE articles SET stored_at = ?, accessed_at = ? WHERE key = ?', (now, now, ключ_url(url)))
+
+    def зберегти(self, url, text, etag=None, last_modified=None):
+        key = ключ_url(url)
+        body = zlib.compress(text.encode('utf-8'), 6)
+        now = time.time()
+        with self.conn:
+            old = self.conn.execute('SELECT size FROM articles WHERE key = ?', (key,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO articles (key, etag, last_modified, stored_at, accessed_at, size, body) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, etag, last_modified, now, now, len(body), body))
+        self._total += len(body) - (old[0] if old else 0)
+        if self._total > self.max_bytes:
+            self._витіснити()
+
+    def _витіснити(self):
+        target = self.max_bytes * EVICT_TO
+        freed = 0
+        evicted = []
+        for key, size in self.conn.execute('SELECT key, size FROM articles ORDER BY accessed_at'):
+            if self._total - freed <= target:
+                break
+            evicted.append((key,))
+            freed += size
+        with self.conn:
+            self.conn.executemany('DELETE FROM articles WHERE key = ?', evicted)
+        self._total -= freed
+        logging.info(f"Кеш статей: витіснено {len(evicted)} записів ({freed} байт)")
@@ -0,0 +1,148 @@
+import base64
+import hashlib
+import logging
+import sqlite3
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from .metrics import вимірювати
+from .state import шлях_стану
+
+LINK_HEADER = "Посилання"
+# Лист з ключами статей, перенесених в архів (scraper.archive): рядок —
+# сайт, ключі base64 (8 байтів на статтю, до KEYS_PER_ROW в одній клітинці) і дата
+DEDUP_SHEET = 'Dedup'
+DEDUP_HEADER = ["Сайт", "Ключі", "Дата"]
+KEYS_PER_ROW = 4000
+KEY_SIZE = 8
+
+def канонічний_url(url):
+    # Одна стаття — один ключ: без фрагмента, utm-міток, www, кінцевого слеша
+    # і з відсортованими параметрами запиту.
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.startswith('utm_'))
+    return urlunsplit(('https' if parts.scheme in ('http', 'https') else parts.scheme, host, path, urlencode(query), ''))
+
+def ключ_url(url):
+    return hashlib.blake2b(канонічний_url(url).encode(), digest_size=KEY_SIZE).digest()
+
+def рядки_ключів(site, keys, day):
+    keys = list(keys)
+    return [[site, base64.b64encode(b''.join(keys[start:start + KEYS_PER_ROW])).decode('ascii'), day]
+            for start in range(0, len(keys), KEYS_PER_ROW)]
+
+def ключі_з_рядка(row):
+    blob = base64.b64decode(row[1])
+    return [blob[start:start + KEY_SIZE] for start in range(0, len(blob), KEY_SIZE)]
+
+# Інкрементальний індекс оброблених статей у SQLite. Для кожного сайту
+# пам'ятаємо, скільки рядків листа оброблених статей уже прочитано, і при
+# синхронізації тягнемо з таблиці лише колонку посилань з нових рядків.
+# Ключі статей, яких після ущільнення вже немає в листах оброблених, читаються
+# з листа Dedup; поява там нових рядків сайту означає, що його лист ущільнено
+# і номери рядків змінилися, тож такий лист перечитується повністю.
+class DedupIndex:
+    def __init__(self, path=None):
+        self.path = path or шлях_стану('dedup.sqlite3')
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS urls (
+                site TEXT NOT NULL,
+                key BLOB NOT NULL,
+                PRIMARY KEY (site, key)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS sync (
+                site TEXT PRIMARY KEY,
+                sheet TEXT NOT NULL,
+                rows INTEGER NOT NULL
+            );
+        ''')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _синхронізовано(self, site, sheet_key):
+        row = self.conn.execute('SELECT sheet, rows FROM sync WHERE site = ?', (site,)).fetchone()
+        if row is None or row[0] != sheet_key:
+            self.скинути(site, sheet_key)
+            return 0
+        return row[1]
+
+    def скинути(self, site, sheet_key, rows=0):
+        with self.conn:
+            self.conn.execute('DELETE FROM urls WHERE site = ?', (site,))
+            self.conn.execute('INSERT OR REPLACE INTO sync (site, sheet, rows) VALUES (?, ?, ?)', (site, sheet_key, rows))
+
+    def встановити_рядки(self, site, sheet_key, rows):
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO sync (site, sheet, rows) VALUES (?, ?, ?)', (site, sheet_key, rows))
+
+    def рядків_архіву(self, writer):
+        return self._синхронізовано(DEDUP_SHEET, f'{writer.spreadsheet_id}/{DEDUP_SHEET}')
+
+    @вимірювати('dedup_sync')
+    def синхронізувати(self, writer, sites):
+        # Лист може бути змінено іншим інстансом, тож дочитуємо хвости одним batchGet
+        writer.забезпечити_листи([DEDUP_SHEET] + [site.processed_sheet for site in sites])
+        known_rows = {}
+        for site in sites:
+            known_rows[site.name] = self._синхронізовано(site.name, f'{writer.spreadsheet_id}/{site.processed_sheet}')
+        archived_rows = self.рядків_архіву(writer)
+        archive, *tables = writer.прочитати(
+            [f'{DEDUP_SHEET}!A{archived_rows + 1}:B']
+            + [f'{site.processed_sheet}!C{known_rows[site.name] + 1}:C' for site in sites])
+        compacted = self.додати_архів(archive)
+        reread = [position for position, site in enumerate(sites) if site.name in compacted and known_rows[site.name]]
+        if reread:
+            for position in reread:
+                site = sites[position]
+                logging.info(f"[{site.name}] Лист {site.processed_sheet} ущільнено, перечитуємо його")
+                self.встановити_рядки(site.name, f'{writer.spreadsheet_id}/{site.processed_sheet}', 0)
+                known_rows[site.name] = 0
+            for position, rows in zip(reread, writer.прочитати([f'{sites[position].processed_sheet}!C1:C' for position in reread])):
+                tables[position] = rows
+        if archive:
+            self.встановити_рядки(DEDUP_SHEET, f'{writer.spreadsheet_id}/{DEDUP_SHEET}', archived_rows + len(archive))
+        for site, rows in zip(sites, tables):
+            urls = [row[0] for row in rows if row and row[0] != LINK_HEADER]
+            self.додати(site.name, urls)
+            if rows:
+                self.встановити_рядки(site.name, f'{writer.spreadsheet_id}/{site.processed_sheet}', known_rows[site.name] + len(rows))
+            logging.info(f"[{site.name}] Індекс дублікатів: {known_rows[site.name]} рядків відомо, дочитано {len(rows)}")
+
+    def додати(self, site, urls):
+        # Кількість прочитаних рядків тут не змінюється: між синхронізацією і
+        # записом інший інстанс міг дописати свої рядки, і зсув на власні
+        # рядки пропустив би чужі. Власні рядки наступна синхронізація
+        # дочитає разом з чужими, а ключі вже є в індексі
+        with self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO urls (site, key) VALUES (?, ?)', ((site, ключ_url(url)) for url in urls))
+
+    def додати_архів(self, rows):
+        # Рядки листа Dedup; повертає сайти, для яких були нові ключі
+        sites = set()
+        with self.conn:
+            for row in rows:
+                if len(row) < 2 or row[:1] == DEDUP_HEADER[:1]:
+                    continue
+                sites.add(row[0])
+                self.conn.executemany('INSERT OR IGNORE INTO urls (site, key) VALUES (?, ?)',
+                                      ((row[0], key) for key in ключі_з_рядка(row)))
+        return sites
+
+    def містить(self, site, url):
+        return self.conn.execute('SELECT 1 FROM urls WHERE site = ? AND key = ?', (site, ключ_url(url))).fetchone() is not None
+
+    def розмір(self, site):
+        return self.conn.execute('SELECT COUNT(*) FROM urls WHERE site = ?', (site,)).fetchone()[0]
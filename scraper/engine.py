@@ -0,0 +1,439 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import date, datetime
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+import aiohttp
+
+from .sites import вибрати_сайти
+from .cache import ArticleCache
+from .dedup import DedupIndex, LINK_HEADER, ключ_url
+from .listing_state import ListingState
+from .neardup import NEARDUP_MODE, відкрити_індекс
+from .relevance import відкрити_оцінювач
+from .metrics import етап, вимірювати, врахувати_час, запуск, записати_підсумок, лічильник, у_потоці
+from .parsing import NOT_FOUND_TEXT, декодувати, отримати_парсер
+from .pipeline import Pipeline
+from .resilience import (
+    TRANSIENT_STATUSES, MAX_RUN_ATTEMPTS, HostRateLimiter, RetryQueue, TransientError,
+    retry_after_з_заголовків, з_повторами,
+)
+from .sheets import запит_випадаючого_списку
+from .storage import відкрити_сховище, після_запуску
+
+# Налаштування логування
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Скільки статей одного сайту завантажувати одночасно та скільки з'єднань тримати на один хост
+CONCURRENCY = int(os.environ.get('SCRAPE_CONCURRENCY', 8))
+LIMIT_PER_HOST = int(os.environ.get('SCRAPE_LIMIT_PER_HOST', 8))
+def доступні_ядра():
+    # У контейнерах процесу часто доступна лише частина ядер машини
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Пул для розбору тексту статей ('thread' або 'process') і його розмір, розмір
+# черг конвеєра і пороги запису в таблицю. Процеси дають справжній паралелізм
+# для bs4, але на Vercel/Lambda недоступні (немає /dev/shm), тож за
+# замовчуванням — потоки; lxml звільняє GIL під час розбору.
+EXTRACT_EXECUTOR = os.environ.get('SCRAPE_EXTRACT_EXECUTOR', 'thread')
+EXTRACT_WORKERS = int(os.environ.get('SCRAPE_EXTRACT_WORKERS', доступні_ядра()))
+QUEUE_SIZE = int(os.environ.get('SCRAPE_QUEUE_SIZE', 32))
+FLUSH_SIZE = int(os.environ.get('SCRAPE_FLUSH_SIZE', 50))
+FLUSH_INTERVAL = float(os.environ.get('SCRAPE_FLUSH_INTERVAL', 10))
+REQUEST_TIMEOUT = 30
+ARTICLE_TIMEOUT = aiohttp.ClientTimeout(total=float(os.environ.get('SCRAPE_ARTICLE_TIMEOUT', 15)), sock_connect=5)
+PARSER = отримати_парсер()
+# Колонку F («Оцінка») заповнює /api/analyze, тож «Схожа на» йде після неї.
+# «Додано» — дата запису (YYYY-MM-DD), за нею scraper.archive переносить старі рядки в архів.
+ARTICLES_HEADER = ["Заголовок", "Статус", "Посилання", "Текст", "Релевантність", "Оцінка", "Схожа на", "Додано"]
+PROCESSED_HEADER = ["Заголовок", "Статус", LINK_HEADER, "Додано"]
+
+def перевірити_змінні_середовища():
+    creds = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+    logging.info(f"GOOGLE_APPLICATION_CREDENTIALS: {'Встановлено' if creds else 'Не встановлено'}")
+    if creds:
+        logging.info(f"Довжина GOOGLE_APPLICATION_CREDENTIALS: {len(creds)}")
+    
+    spreadsheet_id = os.environ.get('SPREADSHEET_ID')
+    logging.info(f"SPREADSHEET_ID: {spreadsheet_id if spreadsheet_id else 'Не встановлено'}")
+
+def створити_сесію():
+    # Одна сесія на весь запуск (усі сайти): keep-alive, пул з'єднань на хост і кеш DNS
+    connector = aiohttp.TCPConnector(limit_per_host=LIMIT_PER_HOST, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+def створити_пул_розбору():
+    if EXTRACT_EXECUTOR == 'process':
+        try:
+            return ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+        except (OSError, NotImplementedError) as e:
+            logging.warning(f"Пул процесів недоступний ({e}), розбір виконуватиметься в потоках")
+    return ThreadPoolExecutor(max_workers=EXTRACT_WORKERS)
+
+@asynccontextmanager
+async def ресурси_запуску(runtime=None):
+    # Сесія, пул потоків розбору і ліміт запитів на хост. Довгоживучий процес
+    # (scraper.runtime.Runtime) передає власні, і тоді тут нічого не створюється
+    # і не закривається; інакше вони живуть лише протягом запуску.
+    if runtime is not None:
+        yield runtime.session, runtime.executor, runtime.limiter
+        return
+    async with AsyncExitStack() as stack:
+        executor = stack.enter_context(створити_пул_розбору())
+        session = await stack.enter_async_context(створити_сесію())
+        yield session, executor, HostRateLimiter()
+
+@вимірювати('fetch_listing')
+async def отримати_список_новин(session, site, listing_state, force=False, limiter=None):
+    # Умовний запит: на 304 або той самий хеш тіла сторінку не розбираємо зовсім
+    headers = {} if force else listing_state.заголовки(site.name)
+
+    async def спроба():
+        if limiter is not None:
+            await limiter.дочекатися(site.listing_url)
+        async with session.get(site.listing_url, headers=headers) as response:
+            if response.status == 304:
+                return None
+            if response.status in TRANSIENT_STATUSES:
+                raise TransientError(f"HTTP {response.status}", retry_after_з_заголовків(response.headers))
+            if response.status >= 400:
+                # Не ClientResponseError від raise_for_status(): той є ClientError
+                # і повторювався б, хоча 403 чи 404 повтор не виправить
+                raise RuntimeError(f"HTTP {response.status}")
+            body = await response.read()
+            лічильник('bytes_downloaded', len(body))
+            return body, await response.text(), response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+    try:
+        fetched = await з_повторами(спроба, site.listing_url)
+    except Exception as e:
+        logging.error(f"Помилка отримання сторінки: {e}")
+        raise RuntimeError("Не вдалося отримати вміст сторінки")
+    if fetched is None:
+        лічильник('listing_not_modified')
+        logging.info(f"[{site.name}] Список новин не змінився (304)")
+        return None
+
+    body, html_content, etag, last_modified = fetched
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    if not force and not listing_state.змінився(site.name, digest):
+        лічильник('listing_not_modified')
+        logging.info(f"[{site.name}] Список новин не змінився (той самий хеш)")
+        return None
+    listing_state.оновити(site.name, etag, last_modified, digest)
+    return html_content
+
+@вимірювати('parse_listing')
+def розібрати_статті(site, html_content, is_known=None):
+    parsed_articles = []
+    for href, title in PARSER.посилання(site, html_content):
+        url = site.нормалізувати_url(href)
+        if is_known is not None and is_known(url):
+            logging.info(f"[{site.name}] Зупинка розбору на вже відомій статті {url}")
+            break
+        parsed_articles.append({'url': url, 'title': title})
+    logging.info(f"[{site.name}] Розібрано {len(parsed_articles)} статей")
+    return parsed_articles
+
+@вимірювати('fetch_article')
+async def завантажити_статтю(session, url, limiter=None, headers=None):
+    # Тимчасові збої (429, 5xx, мережа, тайм-аут) повторюються з затримкою,
+    # а якщо всі спроби невдалі — виняток передається далі.
+    # Повертає (сирі байти сторінки або None на 304, кодування з Content-Type,
+    # ETag, Last-Modified); декодування — разом із розбором у пулі.
+    async def спроба():
+        if limiter is not None:
+            await limiter.дочекатися(url)
+        async with session.get(url, headers=headers, timeout=ARTICLE_TIMEOUT) as response:
+            if response.status in TRANSIENT_STATUSES:
+                raise TransientError(f"HTTP {response.status}", retry_after_з_заголовків(response.headers))
+            body = None
+            if response.status != 304:
+                body = await response.read()
+                лічильник('bytes_downloaded', len(body))
+            return body, response.charset, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+    return await з_повторами(спроба, url)
+
+_парсери = {}
+
+def _текст_статті(site, body, charset, parser_name):
+    # Виконується в пулі розбору (потоки або процеси): отримує сирі байти і
+    # повертає очищений текст разом з часом розбору, бо метрики з іншого
+    # процесу самі до батьківського не потраплять
+    start = time.perf_counter()
+    parser = PARSER if PARSER.name == parser_name else _парсери.setdefault(parser_name, отримати_парсер(parser_name))
+    text = parser.текст_статті(site, декодувати(body, charset))
+    return text, time.perf_counter() - start
+
+@вимірювати('article_total')
+async def отримати_чистий_текст(session, site, url, executor=None, limiter=None, cache=None):
+    # Спершу кеш: свіжий запис не потребує мережі, застарілий перевіряємо умовним запитом
+    cached = cache.отримати(url) if cache is not None else None
+    if cached is not None and cached.свіжа:
+        return cached.text
+    body, charset, etag, last_modified = await завантажити_статтю(
+        session, url, limiter, cached.заголовки() if cached is not None else None)
+    if body is None and cached is not None:
+        cache.підтвердити(url)
+        return cached.text
+    try:
+        # Розбір виконується в пулі, щоб не блокувати інші завантаження
+        loop = asyncio.get_running_loop()
+        text, seconds = await loop.run_in_executor(executor, _текст_статті, site, body or b'', charset, PARSER.name)
+        врахувати_час('parse_article', seconds)
+    except Exception as e:
+        лічильник('articles_failed')
+        return f"Помилка обробки сторінки: {e}"
+    if text == NOT_FOUND_TEXT:
+        лічильник('articles_empty')
+    if cache is not None and text != NOT_FOUND_TEXT:
+        cache.зберегти(url, text, etag, last_modified)
+    return text
+
+@вимірювати('dedup')
+def відібрати_нові(site, articles, index):
+    new_articles = []
+    seen = set()
+    for article in articles:
+        key = ключ_url(article['url'])
+        if key in seen or index.містить(site.name, article['url']):
+            continue
+        seen.add(key)
+        new_articles.append(article)
+    лічильник('articles_new', len(new_articles))
+    лічильник('articles_duplicate', len(articles) - len(new_articles))
+    logging.info(f"[{site.name}] Нових статей: {len(new_articles)} з {len(articles)}")
+    return new_articles
+
+async def список_нових_статей(session, site, index, listing_state, retry_queue, is_initial_scrape=False, limiter=None, prepare=None):
+    html_content = await отримати_список_новин(session, site, listing_state, force=is_initial_scrape, limiter=limiter)
+    retries = retry_queue.статті(site.name)
+    if html_content is None and not retries:
+        return []
+    if prepare is not None:
+        await prepare()
+    articles = []
+    if html_content is not None:
+        stop_at_known = site.newest_first and not is_initial_scrape
+        articles = розібрати_статті(site, html_content, (lambda url: index.містить(site.name, url)) if stop_at_known else None)
+    # Відкладені минулими запусками статті старші за нові, тож ідуть у кінці
+    if retries:
+        logging.info(f"[{site.name}] Повторна спроба для {len(retries)} відкладених статей")
+        # Статтю вже записано іншим шляхом (інший інстанс, дозавантаження):
+        # відібрати_нові її відкине, тож і в черзі їй більше не місце
+        known = [article['url'] for article in retries if index.містить(site.name, article['url'])]
+        if known:
+            retry_queue.видалити(site.name, known)
+    return відібрати_нові(site, articles + retries, index)
+
+async def отримати_або_відкласти(session, site, article, retry_queue, executor=None, limiter=None, cache=None):
+    try:
+        return await отримати_чистий_текст(session, site, article['url'], executor, limiter, cache)
+    except Exception as e:
+        attempts = retry_queue.відкласти(site.name, article, e)
+        if attempts >= MAX_RUN_ATTEMPTS:
+            # Після кількох запусків записуємо статтю з текстом помилки, як раніше
+            лічильник('articles_failed')
+            logging.error(f"[{site.name}] Не вдалося отримати {article['url']} після {attempts} запусків: {e}")
+            return f"Помилка обробки сторінки: {e}"
+        лічильник('articles_deferred')
+        logging.warning(f"[{site.name}] Статтю {article['url']} відкладено до наступного запуску ({attempts}/{MAX_RUN_ATTEMPTS}): {e}")
+        return None
+
+def рядки_для_запису(items, similar=None, skip_similar=False, scores=None):
+    # similar — {позиція в items: url схожої статті}; такі статті або
+    # позначаються посиланням на оригінал, або не потрапляють в Articles зовсім.
+    # scores — оцінки релевантності в тому ж порядку, що й items.
+    similar = similar or {}
+    scores = scores or [""] * len(items)
+    added = date.today().isoformat()
+    rows_by_sheet = {'Articles': []}
+    for position, (site, article, text) in enumerate(items):
+        original = similar.get(position, "")
+        status = "Неопубліковано"
+        if original and skip_similar:
+            status = "Забраковано"
+        else:
+            rows_by_sheet['Articles'].append([article['title'], status, article['url'], text, scores[position], "", original, added])
+        rows_by_sheet.setdefault(site.processed_sheet, []).append([article['title'], status, article['url'], added])
+    return rows_by_sheet
+
+# Записувач порцій конвеєра: перевіряє схожі статті й оцінює релевантність
+# пакета, записує рядки в Articles і листи оброблених статей одним запитом,
+# після чого оновлює індекс дублікатів і чергу повторів. Зміни індексу схожих
+# статей і статистики релевантності фіксуються лише після успішного запису.
+# Конвеєри кількох сайтів ділять один записувач, тож порції обробляються по
+# одній: спільні з'єднання SQLite не використовуються з двох потоків одразу,
+# а фіксація однієї порції не зачіпає незаписані зміни іншої.
+class SheetFlusher:
+    def __init__(self, writer, index, retry_queue, sites, headers=None, extra_requests=None, near_dups=None, scorer=None):
+        self.writer = writer
+        self.index = index
+        self.retry_queue = retry_queue
+        self.sites = sites
+        self.headers = headers or {}
+        self.extra_requests = extra_requests or []
+        self.near_dups = near_dups
+        self.scorer = scorer
+        self.updated_cells = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def має_незаписане(self):
+        return bool(self.headers or self.extra_requests)
+
+    async def __call__(self, items):
+        async with self._lock:
+            await self._записати(items)
+
+    async def _записати(self, items):
+        stores = [store for store in (self.near_dups, self.scorer) if store is not None]
+        similar, scores = {}, None
+        try:
+            if self.near_dups is not None and items:
+                similar = await у_потоці(None, self.near_dups.перевірити_пакет, items)
+            if self.scorer is not None and items:
+                scores = await у_потоці(None, self.scorer.оцінити_пакет, items)
+            rows_by_sheet = рядки_для_запису(items, similar, NEARDUP_MODE == 'skip', scores)
+            for name, header in self.headers.items():
+                rows_by_sheet[name] = header + rows_by_sheet.get(name, [])
+            with етап('write'):
+                self.updated_cells += await у_потоці(None, self.writer.записати, rows_by_sheet, self.extra_requests)
+        except BaseException:
+            for store in stores:
+                store.відкотити()
+            raise
+        for store in stores:
+            store.зафіксувати()
+        лічильник('articles_written', len(items))
+        self.headers, self.extra_requests = {}, []
+        # Індекс оновлюємо лише після успішного запису в таблицю
+        for site in self.sites:
+            urls = [article['url'] for item_site, article, _ in items if item_site is site]
+            if urls:
+                self.index.додати(site.name, urls)
+                self.retry_queue.видалити(site.name, urls)
+
+def створити_конвеєр(produce, fetch, flush, sites):
+    return Pipeline(
+        produce=produce,
+        fetch=fetch,
+        flush=flush,
+        workers=CONCURRENCY * len(sites),
+        queue_size=QUEUE_SIZE,
+        flush_size=FLUSH_SIZE,
+        flush_interval=FLUSH_INTERVAL,
+    )
+
+def підготувати_індекс(writer, index, sites):
+    # Запити до таблиці блокують, тож виконуються в потоці пулу. З'єднання
+    # SQLite прив'язане до потоку, тож там відкривається окреме з'єднання з
+    # тією самою базою; після коміту його зміни бачить і index у циклі подій
+    writer.забезпечити_листи(['Articles'] + [site.processed_sheet for site in sites])
+    with DedupIndex(index.path) as worker_index:
+        worker_index.синхронізувати(writer, sites)
+
+async def виконати_скрапінг(writer, index, listing_state, retry_queue, cache, sites, is_initial_scrape=False, runtime=None, near_dups=None, scorer=None):
+    prepare = None
+    if is_initial_scrape:
+        sheet_ids = writer.забезпечити_листи(['Articles'] + [site.processed_sheet for site in sites])
+        # Лист Articles спільний для всіх сайтів, тож очищаємо його один раз,
+        # а заголовки й випадаючий список додаємо разом з першим записом
+        writer.очистити(['Articles!A:H'] + [f'{site.processed_sheet}!A:D' for site in sites])
+        if near_dups is not None:
+            near_dups.скинути()
+        for site in sites:
+            index.скинути(site.name, f'{writer.spreadsheet_id}/{site.processed_sheet}')
+            retry_queue.очистити(site.name)
+        flusher = SheetFlusher(
+            writer, index, retry_queue, sites,
+            headers={'Articles': [ARTICLES_HEADER], **{site.processed_sheet: [PROCESSED_HEADER] for site in sites}},
+            extra_requests=[запит_випадаючого_списку(sheet_ids['Articles'])],
+            near_dups=near_dups,
+            scorer=scorer,
+        )
+    else:
+        # До таблиці звертаємося лише тоді, коли якийсь сайт справді має що
+        # перевіряти: запуск без змін (304 або той самий хеш) не торкається Sheets
+        flusher = SheetFlusher(writer, index, retry_queue, sites, near_dups=near_dups, scorer=scorer)
+        prepared = False
+
+        async def prepare():
+            nonlocal prepared
+            if not prepared:
+                await у_потоці(None, підготувати_індекс, writer, index, sites)
+                prepared = True
+
+    # Усі вибрані сайти обробляються одночасно в одному циклі подій і з однією сесією
+    async with ресурси_запуску(runtime) as (session, executor, limiter):
+        pipeline = створити_конвеєр(
+            produce=lambda site: список_нових_статей(session, site, index, listing_state, retry_queue, is_initial_scrape, limiter, prepare),
+            fetch=lambda site, article: отримати_або_відкласти(session, site, article, retry_queue, executor, limiter, cache),
+            flush=flusher,
+            sites=sites,
+        )
+        outcome = await pipeline.run(sites)
+
+    if flusher.має_незаписане:
+        # Нових статей не було, але початковий скрапінг має залишити заголовки
+        await flusher([])
+    listing_state.зафіксувати([site.name for site in sites if not isinstance(outcome[site.name], Exception)])
+    return [outcome[site.name] for site in sites], [pipeline.skipped[site.name] for site in sites], flusher.updated_cells
+
+def сформувати_відповідь(sites, results, deferred, updated_cells, is_initial_scrape=False):
+    outcome = {}
+    for site, result, skipped in zip(sites, results, deferred):
+        if isinstance(result, Exception):
+            logging.error(f"[{site.name}] Виникла помилка: {result}")
+            outcome[site.name] = {"error": str(result)}
+            continue
+        if is_initial_scrape:
+            message = f"Початковий скрапінг завершено. Додано {result} статей."
+        else:
+            message = f"Додано {result} нових статей."
+        if skipped:
+            message += f" Відкладено для повтору: {skipped}."
+        logging.info(f"[{site.name}] {message}")
+        outcome[site.name] = {"message": message, "added": result}
+
+    if len(sites) == 1:
+        single = outcome[sites[0].name]
+        if 'message' in single:
+            single = {"message": f"{single['message']} Оновлено {updated_cells} клітинок.", "added": single['added']}
+        return single
+    return {"sites": outcome, "updated_cells": updated_cells}
+
+async def скрапінг(site_names=None, is_initial_scrape=False, runtime=None):
+    start_time = datetime.now()
+    logging.info(f"{'Початковий' if is_initial_scrape else 'Регулярний'} скрапінг розпочато.")
+    
+    перевірити_змінні_середовища()
+    
+    with запуск() as run_metrics:
+        try:
+            sites = вибрати_сайти(site_names)
+            with відкрити_сховище() as writer, DedupIndex() as index, RetryQueue() as retry_queue, ArticleCache() as cache, \
+                    відкрити_індекс() as near_dups, відкрити_оцінювач() as scorer:
+                results, deferred, updated_cells = await виконати_скрапінг(
+                    writer, index, ListingState(), retry_queue, cache, sites, is_initial_scrape, runtime, near_dups, scorer)
+                logging.info(f"Кеш статей: {cache.hits} влучань, {cache.misses} промахів")
+                await після_запуску(writer, runtime)
+        except Exception as e:
+            logging.error(f"Виникла помилка: {str(e)}")
+            response = {"error": str(e)}
+        else:
+            logging.info(f"Скрапінг завершено за {(datetime.now() - start_time).total_seconds():.2f} с. "
+                         f"Оновлено {updated_cells} клітинок, запитів до Sheets: {writer.api_calls}")
+            response = сформувати_відповідь(sites, results, deferred, updated_cells, is_initial_scrape)
+    response['metrics'] = run_metrics.підсумок()
+    записати_підсумок(response['metrics'], 'first' if is_initial_scrape else 'scrape')
+    return json.dumps(response)
@@ -0,0 +1,67 @@
+import os
+import json
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler
+
+from .metrics import prometheus
+from .runtime import виконати_синхронно
+
+def параметри_запиту(query, default_sites):
+    # query — результат parse_qs; повертає (тип запуску, сайти, параметри)
+    site_names = query['sites'][0].split(',') if 'sites' in query else default_sites
+    if query.get('type') == ['backfill']:
+        options = {
+            'until': query.get('until', [None])[0],
+            'restart': query.get('restart') == ['1'],
+            'known_pages': int(query['known_pages'][0]) if 'known_pages' in query else None,
+        }
+        return 'backfill', site_names, options
+    if query.get('type') == ['compact']:
+        options = {
+            'max_age_days': float(query['max_age'][0]) if 'max_age' in query else None,
+            'target': query.get('target', [None])[0],
+        }
+        return 'compact', site_names, options
+    return 'first' if query.get('type') == ['first'] else 'scrape', site_names, {}
+
+def відповідь_з_помилкою(error):
+    return json.dumps({
+        "error": str(error),
+        "details": {key: 'Встановлено' if value else 'Не встановлено' for key, value in os.environ.items() if key.startswith('GOOGLE_') or key == 'SPREADSHEET_ID'}
+    })
+
+def створити_обробник(default_sites):
+    # Маршрути Vercel лише обирають, які сайти обробляти за замовчуванням;
+    # параметр ?sites=babel,apostrophe або ?sites=all їх перевизначає.
+    # ?type=backfill&until=YYYY-MM-DD&restart=1 запускає дозавантаження архіву,
+    # ?type=compact&max_age=14 переносить старі й оброблені рядки таблиці в архів,
+    # ?type=metrics віддає накопичені метрики процесу у форматі Prometheus.
+    # Запуски виконуються у фоновому циклі подій scraper.runtime, спільному
+    # для всіх запитів процесу.
+    class handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            if self.path.startswith('/metrics') or (self.path.startswith('/api/scrape') and query.get('type') == ['metrics']):
+                body = prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.end_headers()
+                self.wfile.write(body)
+            elif self.path.startswith('/api/scrape'):
+                try:
+                    kind, site_names, options = параметри_запиту(query, default_sites)
+                    result = виконати_синхронно(kind, site_names, **options)
+                    self.send_response(200)
+                    self.send_header('Content-type', 'application/json')
+                    self.end_headers()
+                    self.wfile.write(result.encode())
+                except Exception as e:
+                    error_message = відповідь_з_помилкою(e)
+                    self.send_response(500)
+                    self.send_header('Content-type', 'application/json')
+                    self.end_headers()
+                    self.wfile.write(error_message.encode())
+            else:
+                self.send_error(404)
+
+    return handler
@@ -0,0 +1,47 @@
+import json
+import logging
+import os
+
+from .state import шлях_стану
+
+# Валідатори сторінок зі списком новин (ETag, Last-Modified і хеш тіла) для
+# умовних запитів. Нові значення спершу лише запам'ятовуються і фіксуються на
+# диску тільки після успішного запису статей, інакше невдалий запуск призвів
+# би до того, що наступний пропустив би ті самі новини як «без змін».
+class ListingState:
+    def __init__(self, path=None):
+        self.path = path or шлях_стану('listing_state.json')
+        self._pending = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._state = json.load(f)
+        except (OSError, ValueError):
+            self._state = {}
+
+    def заголовки(self, site_name):
+        validators = self._state.get(site_name, {})
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def змінився(self, site_name, digest):
+        return self._state.get(site_name, {}).get('digest') != digest
+
+    def оновити(self, site_name, etag, last_modified, digest):
+        self._pending[site_name] = {'etag': etag, 'last_modified': last_modified, 'digest': digest}
+
+    def зафіксувати(self, site_names):
+        updated = {name: self._pending.pop(name) for name in site_names if name in self._pending}
+        if not updated:
+            return
+        self._state.update(updated)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Не вдалося зберегти валідатори списку новин: {e}")
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Якщо задано, підсумок кожного запуску дописується сюди одним рядком JSON
+METRICS_FILE = os.environ.get('SCRAPE_METRICS_FILE')
+PROMETHEUS_PREFIX = 'newsscrape'
+
+# Таймери етапів і лічильники одного запуску. Етапи виконуються паралельно
+# в циклі подій і пулах потоків, тож сумарний час етапу може бути більшим
+# за тривалість запуску.
+class RunMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # етап -> [кількість, сума секунд, максимум секунд]
+        self.timers = defaultdict(lambda: [0, 0.0, 0.0])
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def додати(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def врахувати_час(self, stage, seconds):
+        with self._lock:
+            timer = self.timers[stage]
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def підсумок(self):
+        with self._lock:
+            return {
+                'duration_seconds': round(time.perf_counter() - self.started, 3),
+                'stages': {
+                    stage: {'count': count, 'seconds': round(total, 4), 'max_seconds': round(longest, 4)}
+                    for stage, (count, total, longest) in sorted(self.timers.items())
+                },
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+# Накопичені від старту процесу значення для Prometheus і метрики поточного
+# запуску (через contextvars, щоб паралельні запуски не змішувалися)
+ПРОЦЕС = RunMetrics()
+_поточний_запуск = contextvars.ContextVar('scrape_run_metrics', default=None)
+
+def _отримувачі():
+    run = _поточний_запуск.get()
+    return (ПРОЦЕС,) if run is None else (ПРОЦЕС, run)
+
+def лічильник(name, value=1):
+    for metrics in _отримувачі():
+        metrics.додати(name, value)
+
+def врахувати_час(stage, seconds):
+    for metrics in _отримувачі():
+        metrics.врахувати_час(stage, seconds)
+
+@contextmanager
+def етап(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        врахувати_час(stage, time.perf_counter() - start)
+
+def вимірювати(stage):
+    # Декоратор таймера етапу для звичайних і асинхронних функцій
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with етап(stage):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with етап(stage):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def запуск():
+    # Збирає метрики всього, що виконується всередині блоку (і в у_потоці())
+    metrics = RunMetrics()
+    token = _поточний_запуск.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _поточний_запуск.reset(token)
+        ПРОЦЕС.додати('runs')
+
+def у_потоці(executor, func, *args):
+    # run_in_executor не переносить contextvars у потік, тож копіюємо контекст
+    # явно, інакше етапи з пулу не потраплять у метрики запуску
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(executor, contextvars.copy_context().run, func, *args)
+
+def записати_підсумок(summary, kind):
+    if not METRICS_FILE:
+        return
+    line = json.dumps({'time': time.time(), 'kind': kind, **summary}, ensure_ascii=False)
+    try:
+        with open(METRICS_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        logging.warning(f"Не вдалося записати метрики у {METRICS_FILE}: {e}")
+
+def prometheus():
+    # Текстовий формат експозиції Prometheus для накопичених метрик процесу
+    with ПРОЦЕС._lock:
+        timers = sorted((stage, list(timer)) for stage, timer in ПРОЦЕС.timers.items())
+        counters = sorted(ПРОЦЕС.counters.items())
+    lines = []
+    for metric, kind, column in (('stage_calls_total', 'counter', 0),
+                                 ('stage_seconds_total', 'counter', 1),
+                                 ('stage_max_seconds', 'gauge', 2)):
+        lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{metric} {kind}')
+        lines.extend(f'{PROMETHEUS_PREFIX}_{metric}{{stage="{stage}"}} {timer[column]}' for stage, timer in timers)
+    for name, value in counters:
+        lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{name}_total counter')
+        lines.append(f'{PROMETHEUS_PREFIX}_{name}_total {value}')
+    lines.append(f'# TYPE {PROMETHEUS_PREFIX}_uptime_seconds gauge')
+    lines.append(f'{PROMETHEUS_PREFIX}_uptime_seconds {time.perf_counter() - ПРОЦЕС.started:.3f}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,196 @@
+import contextlib
+import functools
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import time
+import zlib
+
+from .metrics import вимірювати, лічильник
+from .parsing import NOT_FOUND_TEXT
+from .state import шлях_стану
+
+# Що робити зі схожою статтею: 'flag' — записати з посиланням на оригінал у
+# колонці «Схожа на», 'skip' — не записувати в Articles (у листі оброблених
+# вона позначається як «Забраковано»), 'off' — не перевіряти зовсім.
+# Поріг — оцінка подібності Жаккара за множинами шинглів; записи старші за
+# NEARDUP_MAX_AGE_DAYS днів з індексу видаляються.
+NEARDUP_MODE = os.environ.get('SCRAPE_NEARDUP_MODE', 'flag')
+NEARDUP_THRESHOLD = float(os.environ.get('SCRAPE_NEARDUP_THRESHOLD', 0.7))
+NEARDUP_MAX_AGE_DAYS = float(os.environ.get('SCRAPE_NEARDUP_MAX_AGE_DAYS', 30))
+NUM_PERM = 128
+SHINGLE_WORDS = 5
+# Коротші тексти (анонси, помилки розбору) дають хибні збіги, їх не перевіряємо
+MIN_WORDS = 30
+
+_WORD = re.compile(r'\w+')
+
+def шинглі(text, size=SHINGLE_WORDS):
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+@functools.lru_cache(maxsize=None)
+def _перестановки(num_perm):
+    import numpy as np
+    rng = np.random.default_rng(1)
+    a = rng.integers(0, 2**64, size=num_perm, dtype=np.uint64, endpoint=False) | np.uint64(1)
+    b = rng.integers(0, 2**64, size=num_perm, dtype=np.uint64, endpoint=False)
+    return a, b
+
+def сигнатура(text, num_perm=NUM_PERM):
+    # MinHash: для кожної з num_perm хеш-функцій — мінімум по хешах шинглів.
+    # Функції виду (a*x + b) mod 2**64 >> 32 (multiply-shift): переповнення uint64
+    # тут і є взяттям за модулем, тож обходимося без повільного ділення.
+    import numpy as np
+    shingles = шинглі(text)
+    if not shingles:
+        return None
+    # crc32 стабільний між процесами (на відміну від hash()) і набагато швидший за blake2b
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    a, b = _перестановки(num_perm)
+    values = (np.outer(hashes, a) + b) >> np.uint64(32)
+    return values.min(axis=0).astype(np.uint32)
+
+def схожість(first, second):
+    return float((first == second).mean())
+
+def параметри_lsh(threshold, num_perm=NUM_PERM):
+    # Смуги (bands) по rows значень: кандидатами стають документи, що збіглися
+    # хоча б в одній смузі. Беремо розбиття, чия точка перегину (1/b)^(1/r)
+    # не вища за поріг, тож схожі статті майже напевно потрапляють у кандидати,
+    # а зайвих відсіює точна оцінка за повною сигнатурою.
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+# Індекс MinHash LSH у SQLite, спільний для всіх сайтів і запусків. Пошук
+# схожої статті — по одному запиту на смугу за індексованим ключем кошика,
+# тож час не залежить від розміру індексу лінійно.
+class NearDuplicateIndex:
+    def __init__(self, path=None, threshold=None, num_perm=NUM_PERM):
+        self.threshold = NEARDUP_THRESHOLD if threshold is None else threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = параметри_lsh(self.threshold, num_perm)
+        # Перевірка і запис пакета виконуються в пулі потоків, але завжди по
+        # одному: SheetFlusher серіалізує порції всіх сайтів
+        self.conn = sqlite3.connect(path or шлях_стану('neardup.sqlite3'), timeout=30, check_same_thread=False)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                site TEXT NOT NULL,
+                url TEXT NOT NULL,
+                added_at REAL NOT NULL,
+                signature BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS docs_added_at ON docs (added_at);
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                doc INTEGER NOT NULL,
+                PRIMARY KEY (band, bucket, doc)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS bands_doc ON bands (doc);
+        ''')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _кошики(self, signature):
+        # Ключ кошика смуги — 8 байтів хешу її значень (і номера смуги)
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(chunk, digest_size=8, person=band.to_bytes(2, 'little')).digest()
+            yield band, int.from_bytes(digest, 'little', signed=True)
+
+    def знайти(self, signature, buckets=None):
+        # Повертає (url, site, схожість) найсхожішої статті не нижче порогу або None
+        import numpy as np
+        candidates = set()
+        for band, bucket in buckets or self._кошики(signature):
+            candidates.update(doc for (doc,) in self.conn.execute(
+                'SELECT doc FROM bands WHERE band = ? AND bucket = ?', (band, bucket)))
+        best = None
+        for doc in candidates:
+            url, site, blob = self.conn.execute('SELECT url, site, signature FROM docs WHERE id = ?', (doc,)).fetchone()
+            similarity = схожість(signature, np.frombuffer(blob, dtype=np.uint32))
+            if similarity >= self.threshold and (best is None or similarity > best[2]):
+                best = (url, site, similarity)
+        return best
+
+    def додати(self, site, url, signature, buckets=None):
+        cursor = self.conn.execute(
+            'INSERT INTO docs (site, url, added_at, signature) VALUES (?, ?, ?, ?)',
+            (site, url, time.time(), signature.tobytes()))
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO bands (band, bucket, doc) VALUES (?, ?, ?)',
+            [(band, bucket, cursor.lastrowid) for band, bucket in buckets or self._кошики(signature)])
+
+    @вимірювати('near_dup')
+    def перевірити_пакет(self, items):
+        # items — (site, article, text) з конвеєра. Повертає {позиція: url
+        # оригіналу} для схожих статей; решта додається до індексу, але
+        # фіксується лише після успішного запису (зафіксувати/відкотити).
+        similar = {}
+        for position, (site, article, text) in enumerate(items):
+            if text == NOT_FOUND_TEXT or text.startswith("Помилка обробки сторінки"):
+                continue
+            signature = сигнатура(text, self.num_perm)
+            if signature is None:
+                continue
+            buckets = list(self._кошики(signature))
+            match = self.знайти(signature, buckets)
+            if match is not None:
+                url, original_site, similarity = match
+                logging.info(f"[{site.name}] {article['url']} схожа ({similarity:.2f}) на {url} ({original_site})")
+                лічильник('articles_near_duplicate')
+                similar[position] = url
+                continue
+            self.додати(site.name, article['url'], signature, buckets)
+        return similar
+
+    def зафіксувати(self):
+        self.conn.commit()
+
+    def відкотити(self):
+        self.conn.rollback()
+
+    def обрізати(self, max_age_days=None):
+        cutoff = time.time() - (NEARDUP_MAX_AGE_DAYS if max_age_days is None else max_age_days) * 86400
+        with self.conn:
+            stale = [doc for (doc,) in self.conn.execute('SELECT id FROM docs WHERE added_at < ?', (cutoff,))]
+            self.conn.executemany('DELETE FROM bands WHERE doc = ?', [(doc,) for doc in stale])
+            self.conn.executemany('DELETE FROM docs WHERE id = ?', [(doc,) for doc in stale])
+        return len(stale)
+
+    def скинути(self):
+        with self.conn:
+            self.conn.execute('DELETE FROM bands')
+            self.conn.execute('DELETE FROM docs')
+
+    def розмір(self):
+        return self.conn.execute('SELECT COUNT(*) FROM docs').fetchone()[0]
+
+def відкрити_індекс():
+    # Контекст з індексом або з None, якщо перевірку схожих статей вимкнено
+    if NEARDUP_MODE == 'off':
+        return contextlib.nullcontext()
+    index = NearDuplicateIndex()
+    removed = index.обрізати()
+    if removed:
+        logging.info(f"Індекс схожих статей: видалено {removed} застарілих записів")
+    return index
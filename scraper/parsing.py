@@ -0,0 +1,192 @@
+import os
+import re
+import logging
+
+try:
+    import lxml.etree
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError:  # lxml і cssselect необов'язкові, без них працює BeautifulSoup
+    lxml = None
+
+# Бекенд розбору HTML: 'lxml' (за наявності) або 'bs4'. Обидва мають давати
+# однаковий результат; перевірка — перевірити_паритет() нижче.
+PARSER = os.environ.get('SCRAPER_PARSER', 'lxml')
+
+NOT_FOUND_TEXT = "Вміст статті не знайдено."
+_SIMPLE_SELECTOR = re.compile(r'^([a-zA-Z][a-zA-Z0-9]*)(?:\.([\w-]+))?$')
+# BeautifulSoup не включає в get_text() вміст цих тегів і коментарі
+_SKIPPED_TAGS = {'script', 'style', 'template'}
+# Вміст цих тегів libxml2 лишає сирим текстом з розміткою, а html.parser
+# розбирає як звичайний HTML, тож для lxml він розбирається повторно
+_RAW_TEXT_TAGS = {'textarea', 'xmp', 'iframe', 'noembed', 'noframes', 'plaintext'}
+# Рядки лише з пробільних символів ASCII BeautifulSoup замінює на '\n' або ' ',
+# крім рядків усередині цих тегів
+_PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+_ASCII_SPACES = ' \n\t\x0c\r'
+
+def декодувати(body, charset=None):
+    # Сирі байти сторінки в рядок за кодуванням із заголовка Content-Type. Без
+    # нього пробуємо UTF-8, а інакше віддаємо байти як є: і lxml, і bs4 самі
+    # визначають кодування з <meta charset>.
+    if charset:
+        try:
+            return body.decode(charset, errors='replace')
+        except LookupError:
+            pass
+    try:
+        return body.decode('utf-8')
+    except UnicodeDecodeError:
+        return body
+
+def очистити_текст(strings):
+    return ' '.join(s.strip() for s in strings if s.strip()).replace('\xa0', ' ')
+
+def _умова_класу(expected):
+    # Під час розбору з parse_only клас приходить рядком або списком залежно від
+    # версії bs4; порівнюємо так само, як find(): один клас — входження, кілька — точний збіг
+    def matches(value):
+        if value is None:
+            return False
+        classes = value if isinstance(value, list) else value.split()
+        if ' ' in expected:
+            return ' '.join(classes) == expected
+        return expected in classes
+    return matches
+
+def _strainer(tag, attrs):
+    from bs4 import SoupStrainer
+    return SoupStrainer(tag, attrs={key: _умова_класу(value) if key == 'class' else value for key, value in attrs.items()})
+
+# bs4 імпортується в методах: за замовчуванням працює lxml, і запуск без
+# нових статей не має платити за імпорт BeautifulSoup
+class Bs4Parser:
+    name = 'bs4'
+
+    def _strainer_списку(self, site):
+        # Розбираємо лише елементи списку, якщо селектор має простий вигляд tag.class
+        match = _SIMPLE_SELECTOR.match(site.item_selector)
+        if not match:
+            return None
+        tag, cls = match.groups()
+        return _strainer(tag, {'class': cls} if cls else {})
+
+    def посилання(self, site, html_content):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html_content, 'html.parser', parse_only=self._strainer_списку(site))
+        for article in soup.select(site.item_selector):
+            link = article.select_one(site.link_selector)
+            if link:
+                yield link['href'], link.text.strip()
+
+    def текст_статті(self, site, html_content):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html_content, 'html.parser', parse_only=_strainer(site.body_tag, site.body_attrs))
+        article_div = soup.find(site.body_tag, attrs=site.body_attrs)
+        if article_div:
+            return article_div.get_text(separator=' ', strip=True).replace('\xa0', ' ')
+        return NOT_FOUND_TEXT
+
+def _рядок(text, preserve):
+    if preserve or text.strip(_ASCII_SPACES):
+        return text
+    return '\n' if '\n' in text else ' '
+
+def _рядки(element, preserve=False):
+    # Ті самі текстові вузли, що й у BeautifulSoup.get_text() з html.parser
+    preserve = preserve or element.tag in _PRESERVE_WHITESPACE_TAGS
+    if element.text and element.tag not in _SKIPPED_TAGS:
+        if element.tag in _RAW_TEXT_TAGS:
+            yield from _рядки(lxml.html.fragment_fromstring(element.text, create_parent='div'), preserve)
+        else:
+            yield _рядок(element.text, preserve)
+    for child in element:
+        if isinstance(child.tag, str):
+            if child.tag not in _SKIPPED_TAGS:
+                yield from _рядки(child, preserve)
+        elif child.tag is lxml.etree.Comment and child.text and child.text.startswith('[CDATA[') and child.text.endswith(']]'):
+            # libxml2 перетворює <![CDATA[...]]> у HTML на коментар, а bs4 лишає його текстом
+            yield child.text[7:-2]
+        if child.tail:
+            yield _рядок(child.tail, preserve)
+
+def _xpath_атрибутів(tag, attrs):
+    conditions = []
+    for key, value in attrs.items():
+        if key == 'class' and ' ' not in value:
+            conditions.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {value} ')")
+        elif key == 'class':
+            conditions.append(f"normalize-space(@class)='{value}'")
+        else:
+            conditions.append(f"@{key}='{value}'")
+    return f"//{tag}" + (f"[{' and '.join(conditions)}]" if conditions else '')
+
+class LxmlParser:
+    name = 'lxml'
+
+    def __init__(self):
+        self._selectors = {}
+        self._utf8_parser = lxml.html.HTMLParser(encoding='utf-8')
+
+    def _селектор(self, css):
+        if css not in self._selectors:
+            self._selectors[css] = CSSSelector(css, translator='html')
+        return self._selectors[css]
+
+    def _документ(self, html_content):
+        if not html_content or not html_content.strip():
+            return None
+        try:
+            return lxml.html.document_fromstring(html_content)
+        except ValueError:
+            # Рядок з XML-декларацією кодування lxml приймає лише як байти
+            return lxml.html.document_fromstring(html_content.encode('utf-8'), parser=self._utf8_parser)
+
+    def посилання(self, site, html_content):
+        document = self._документ(html_content)
+        if document is None:
+            return
+        link_selector = self._селектор(site.link_selector)
+        for article in self._селектор(site.item_selector)(document):
+            links = link_selector(article)
+            if links and links[0].get('href') is not None:
+                yield links[0].get('href'), ''.join(_рядки(links[0])).strip()
+
+    def текст_статті(self, site, html_content):
+        document = self._документ(html_content)
+        if document is not None:
+            nodes = document.xpath(_xpath_атрибутів(site.body_tag, site.body_attrs))
+            if nodes:
+                return очистити_текст(_рядки(nodes[0]))
+        return NOT_FOUND_TEXT
+
+def отримати_парсер(name=None):
+    name = name or PARSER
+    if name == 'lxml' and lxml is not None:
+        return LxmlParser()
+    if name not in ('bs4', 'lxml'):
+        logging.warning(f"Невідомий бекенд розбору '{name}', використовуємо bs4")
+    return Bs4Parser()
+
+def перевірити_паритет(site, listing_html=None, article_html=None, parser=None):
+    # Порівнює результат бекенду з еталонним розбором BeautifulSoup без фільтрації
+    from bs4 import BeautifulSoup
+    parser = parser or отримати_парсер()
+    mismatches = []
+    if listing_html is not None:
+        soup = BeautifulSoup(listing_html, 'html.parser')
+        expected = []
+        for article in soup.select(site.item_selector):
+            link = article.select_one(site.link_selector)
+            if link:
+                expected.append((link['href'], link.text.strip()))
+        actual = list(parser.посилання(site, listing_html))
+        if actual != expected:
+            mismatches.append(('listing', expected, actual))
+    if article_html is not None:
+        article_div = BeautifulSoup(article_html, 'html.parser').find(site.body_tag, attrs=site.body_attrs)
+        expected = article_div.get_text(separator=' ', strip=True).replace('\xa0', ' ') if article_div else NOT_FOUND_TEXT
+        actual = parser.текст_статті(site, article_html)
+        if actual != expected:
+            mismatches.append(('article', expected, actual))
+    return mismatches
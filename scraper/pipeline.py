@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+
+_DONE = object()
+
+# Потоковий конвеєр скрапінгу з обмеженими чергами:
+#
+#   produce(site) -> статті  →  [fetch_queue]  →  fetch(site, article) × workers
+#                            →  [write_queue]  →  flush(items) за розміром або часом
+#
+# Якщо fetch повертає None, стаття пропускається (її відкладено на наступний запуск).
+#
+# Черги обмежені, тож пам'ять не росте з кількістю статей, а завантаження,
+# розбір і запис перекриваються в часі. Записувач відновлює порядок статей
+# у списку кожного сайту, тому в таблиці вони йдуть так само, як на сайті.
+class Pipeline:
+    def __init__(self, produce, fetch, flush, workers=8, queue_size=16, flush_size=50, flush_interval=10.0):
+        self.produce = produce
+        self.fetch = fetch
+        self.flush = flush
+        self.workers = workers
+        self.queue_size = queue_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.skipped = {}
+
+    async def run(self, sites):
+        fetch_queue = asyncio.Queue(self.queue_size)
+        write_queue = asyncio.Queue(self.queue_size)
+        # Для кожного сайту: кількість записаних статей або виняток зі списку новин
+        results = {site.name: 0 for site in sites}
+        self.skipped = {site.name: 0 for site in sites}
+
+        async def продюсер(site):
+            try:
+                articles = await self.produce(site)
+            except Exception as e:
+                results[site.name] = e
+                return
+            for seq, article in enumerate(articles):
+                await fetch_queue.put((site, seq, article))
+
+        async def воркер():
+            while True:
+                item = await fetch_queue.get()
+                if item is _DONE:
+                    return
+                site, seq, article = item
+                text = await self.fetch(site, article)
+                await write_queue.put((site, seq, article, text))
+
+        async def подача():
+            workers = asyncio.gather(*(воркер() for _ in range(self.workers)))
+            try:
+                await asyncio.gather(*(продюсер(site) for site in sites))
+                for _ in range(self.workers):
+                    await fetch_queue.put(_DONE)
+                await workers
+            finally:
+                workers.cancel()
+            await write_queue.put(_DONE)
+
+        async def записувач():
+            pending = {site.name: {} for site in sites}
+            next_seq = {site.name: 0 for site in sites}
+            buffer = []
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    item = await asyncio.wait_for(write_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    item = None
+                if item is not None and item is not _DONE:
+                    site, seq, article, text = item
+                    pending[site.name][seq] = (site, article, text)
+                    # Випускаємо лише безперервний префікс у порядку списку
+                    while next_seq[site.name] in pending[site.name]:
+                        ready = pending[site.name].pop(next_seq[site.name])
+                        next_seq[site.name] += 1
+                        if ready[2] is None:
+                            self.skipped[site.name] += 1
+                        else:
+                            buffer.append(ready)
+                    if buffer and deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                if buffer and (item is None or item is _DONE or len(buffer) >= self.flush_size):
+                    await self.flush(buffer)
+                    for site, _, _ in buffer:
+                        results[site.name] += 1
+                    buffer = []
+                    deadline = None
+                if item is _DONE:
+                    return
+
+        feed_task = asyncio.ensure_future(подача())
+        writer_task = asyncio.ensure_future(записувач())
+        try:
+            # Якщо запис упаде, подачу треба зупинити, інакше вона заблокується на повній черзі
+            done, _ = await asyncio.wait([feed_task, writer_task], return_when=asyncio.FIRST_EXCEPTION)
+            if writer_task in done and writer_task.exception() is not None:
+                raise writer_task.exception()
+            await feed_task
+            await writer_task
+        finally:
+            for task in (feed_task, writer_task):
+                if not task.done():
+                    task.cancel()
+        logging.info(f"Конвеєр завершено: {results}")
+        return results
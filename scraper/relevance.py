@@ -0,0 +1,161 @@
+import contextlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+from collections import Counter, defaultdict
+from itertools import chain, count
+
+from .metrics import вимірювати
+from .parsing import NOT_FOUND_TEXT
+from .state import шлях_стану
+
+# Локальна оцінка релевантності для колонки «Релевантність»: косинусна
+# подібність TF-IDF вектора статті до тематичного профілю (основи слів з
+# вагами), у відсотках. SCRAPE_RELEVANCE=off вимикає оцінку, а
+# SCRAPE_TOPIC_PROFILE задає власний профіль у форматі topic_profile.json.
+RELEVANCE = os.environ.get('SCRAPE_RELEVANCE', 'on')
+TOPIC_PROFILE = os.environ.get(
+    'SCRAPE_TOPIC_PROFILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topic_profile.json'))
+# Слова заголовка важать більше, ніж слова тексту
+TITLE_WEIGHT = 3
+# Обмеження SQLite на кількість параметрів одного запиту
+_SQL_CHUNK = 900
+
+_WORD = re.compile(r'\w+')
+
+def завантажити_профіль(path=None):
+    with open(path or TOPIC_PROFILE, encoding='utf-8') as f:
+        profile = json.load(f)
+    return {stem.lower(): float(weight) for stem, weight in profile['terms'].items()}
+
+# Статистика документної частоти слів (для IDF) зберігається в SQLite і
+# доповнюється кожним записаним пакетом. Для оцінки пакета читаються лише
+# слова цього пакета, тож розмір словника на час запуску не впливає.
+class RelevanceScorer:
+    def __init__(self, path=None, profile=None):
+        self.profile = profile if profile is not None else завантажити_профіль()
+        self._profile_norm = math.sqrt(sum(weight * weight for weight in self.profile.values()))
+        self._stem_lengths = sorted({len(stem) for stem in self.profile}, reverse=True)
+        # Початки найкоротшої довжини відсікають більшість слів поза темою одним пошуком
+        self._min_length = min(self._stem_lengths, default=0)
+        self._prefixes = {stem[:self._min_length] for stem in self.profile}
+        self._weights = {}
+        # Оцінка виконується в пулі потоків, але завжди по одному пакету
+        self.conn = sqlite3.connect(path or шлях_стану('relevance.sqlite3'), timeout=30, check_same_thread=False)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS vocab (
+                token TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        ''')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def вага(self, token):
+        # Вага найдовшої основи профілю, з якої починається слово (0 — поза темою)
+        weight = self._weights.get(token)
+        if weight is None:
+            weight = 0.0
+            if token[:self._min_length] not in self._prefixes:
+                self._weights[token] = weight
+                return weight
+            for length in self._stem_lengths:
+                if len(token) >= length and token[:length] in self.profile:
+                    weight = self.profile[token[:length]]
+                    break
+            self._weights[token] = weight
+        return weight
+
+    def _документів(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'docs'").fetchone()
+        return row[0] if row else 0
+
+    def _частоти(self, tokens):
+        df = {}
+        for start in range(0, len(tokens), _SQL_CHUNK):
+            chunk = tokens[start:start + _SQL_CHUNK]
+            df.update(self.conn.execute(
+                f"SELECT token, df FROM vocab WHERE token IN ({','.join('?' * len(chunk))})", chunk))
+        return [df.get(token, 0) for token in tokens]
+
+    @вимірювати('relevance')
+    def оцінити_пакет(self, items):
+        # items — (site, article, text) з конвеєра; повертає список оцінок
+        # (відсотки з одним знаком) або "" для статей без тексту
+        import numpy as np
+        # Кількості слів кожного документа рахує Counter (цикл у C), тож у
+        # Python лишається один прохід по документах, а не по словах
+        doc_counts, scored = [], []
+        for position, (site, article, text) in enumerate(items):
+            if text == NOT_FOUND_TEXT or text.startswith("Помилка обробки сторінки"):
+                continue
+            counts = Counter(_WORD.findall(text.lower()))
+            counts.update(_WORD.findall(article['title'].lower()) * TITLE_WEIGHT)
+            if counts:
+                scored.append(position)
+                doc_counts.append(counts)
+        scores = [""] * len(items)
+        if not scored:
+            return scores
+
+        # Розріджена матриця «документ × слово» у вигляді пар (doc, term) з
+        # кількостями. Номер нового слова видає defaultdict, тож словник пакета
+        # будується тим самим відображенням без циклу в Python, а добутки і
+        # норми рахуються через bincount
+        vocabulary = defaultdict(count().__next__)
+        lengths = np.fromiter(map(len, doc_counts), dtype=np.int64, count=len(doc_counts))
+        pairs = int(lengths.sum())
+        terms = np.fromiter(map(vocabulary.__getitem__, chain.from_iterable(doc_counts)), dtype=np.int64, count=pairs)
+        counts = np.fromiter(chain.from_iterable(map(Counter.values, doc_counts)), dtype=np.float64, count=pairs)
+        docs = np.repeat(np.arange(len(doc_counts)), lengths)
+        tokens = list(vocabulary)
+        size = len(tokens)
+        batch_df = np.bincount(terms, minlength=size)
+        total_docs = self._документів() + len(scored)
+        df = np.asarray(self._частоти(tokens), dtype=np.float64) + batch_df
+        idf = np.log((total_docs + 1) / (df + 1)) + 1
+
+        weights = (1 + np.log(counts)) * idf[terms]
+        profile = np.fromiter((self.вага(token) for token in tokens), dtype=np.float64, count=size)
+        norms = np.sqrt(np.bincount(docs, weights=weights * weights, minlength=len(scored)))
+        dots = np.bincount(docs, weights=weights * profile[terms], minlength=len(scored))
+        similarity = np.clip(dots / (norms * self._profile_norm), 0.0, 1.0)
+        for position, value in zip(scored, similarity):
+            scores[position] = round(float(value) * 100, 1)
+
+        # Статистика оновлюється в тій самій транзакції, що фіксується після запису
+        self.conn.executemany(
+            'INSERT INTO vocab (token, df) VALUES (?, ?) ON CONFLICT (token) DO UPDATE SET df = df + excluded.df',
+            zip(tokens, batch_df.tolist()))
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('docs', ?)", (total_docs,))
+        return scores
+
+    def зафіксувати(self):
+        self.conn.commit()
+
+    def відкотити(self):
+        self.conn.rollback()
+
+def відкрити_оцінювач():
+    # Контекст з оцінювачем або з None, якщо оцінку вимкнено чи профіль не вдалося прочитати
+    if RELEVANCE == 'off':
+        return contextlib.nullcontext()
+    try:
+        return RelevanceScorer()
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Оцінку релевантності вимкнено: не вдалося прочитати профіль {TOPIC_PROFILE}: {e}")
+        return contextlib.nullcontext()
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import sqlite3
+import sys
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from .metrics import лічильник
+from .state import шлях_стану
+
+# Ліміт запитів на один хост (запитів за секунду та розмір «пачки»), кількість
+# спроб у межах запуску і межі експоненційної затримки між ними
+HOST_RATE = float(os.environ.get('SCRAPE_HOST_RATE', 10))
+HOST_BURST = int(os.environ.get('SCRAPE_HOST_BURST', 8))
+RETRY_ATTEMPTS = int(os.environ.get('SCRAPE_RETRY_ATTEMPTS', 3))
+RETRY_BASE_DELAY = float(os.environ.get('SCRAPE_RETRY_BASE_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.environ.get('SCRAPE_RETRY_MAX_DELAY', 20))
+# Скільки запусків поспіль стаття може бути відкладена, перш ніж її буде
+# записано з текстом помилки, як раніше
+MAX_RUN_ATTEMPTS = int(os.environ.get('SCRAPE_MAX_RUN_ATTEMPTS', 3))
+
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+class TransientError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def затримка(attempt, retry_after=None):
+    # Експоненційна затримка з «повним» джитером; Retry-After від сервера має пріоритет
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def retry_after_з_заголовків(headers):
+    # aiohttp віддає заголовки без урахування регістру, httplib2 — у нижньому регістрі
+    value = headers.get('Retry-After', headers.get('retry-after'))
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def взяти(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostRateLimiter:
+    def __init__(self, rate=None, capacity=None):
+        self.rate = rate or HOST_RATE
+        self.capacity = capacity or HOST_BURST
+        self._buckets = {}
+
+    async def дочекатися(self, url):
+        host = urlsplit(url).hostname
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.capacity)
+        await self._buckets[host].взяти()
+
+async def з_повторами(operation, description, attempts=None, on_retry=None):
+    # operation — асинхронна функція без аргументів, що кидає TransientError,
+    # aiohttp.ClientError або asyncio.TimeoutError на тимчасових збоях
+    attempts = attempts or RETRY_ATTEMPTS
+    for attempt in range(attempts):
+        try:
+            return await operation()
+        except (TransientError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt + 1 == attempts:
+                raise
+            delay = затримка(attempt, getattr(e, 'retry_after', None))
+            logging.warning(f"{description}: тимчасова помилка ({e!r}), повтор через {delay:.1f} с")
+            лічильник('http_retries')
+            if on_retry is not None:
+                on_retry()
+            await asyncio.sleep(delay)
+
+def _відповідь_http(error):
+    # googleapiclient важкий і імпортується лише разом з клієнтом Sheets; якщо
+    # його ще не імпортовано, помилка точно не HttpError
+    errors = sys.modules.get('googleapiclient.errors')
+    return error.resp if errors is not None and isinstance(error, errors.HttpError) else None
+
+def тимчасова_помилка_sheets(error):
+    resp = _відповідь_http(error)
+    if resp is not None:
+        return resp.status in TRANSIENT_STATUSES or (
+            resp.status == 403 and b'rateLimitExceeded' in (getattr(error, 'content', None) or b''))
+    return isinstance(error, (socket.timeout, ConnectionError, TimeoutError))
+
+def виконати_з_повторами(request, attempts=None, on_retry=None):
+    # Синхронний аналог з_повторами для запитів googleapiclient (квоти Sheets)
+    attempts = attempts or RETRY_ATTEMPTS
+    for attempt in range(attempts):
+        try:
+            return request.execute()
+        except Exception as e:
+            if attempt + 1 == attempts or not тимчасова_помилка_sheets(e):
+                raise
+            resp = _відповідь_http(e)
+            retry_after = retry_after_з_заголовків(resp) if resp is not None else None
+            delay = затримка(attempt, retry_after)
+            logging.warning(f"Google Sheets: тимчасова помилка ({e}), повтор через {delay:.1f} с")
+            лічильник('sheets_retries')
+            if on_retry is not None:
+                on_retry()
+            time.sleep(delay)
+
+# Статті, які не вдалося завантажити через тимчасові збої. Вони не потрапляють
+# у таблицю й індекс дублікатів, а наступний запуск пробує їх знову.
+class RetryQueue:
+    def __init__(self, path=None):
+        self.conn = sqlite3.connect(path or шлях_стану('retry.sqlite3'), timeout=30)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS retry (
+                site TEXT NOT NULL,
+                url TEXT NOT NULL,
+                title TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                PRIMARY KEY (site, url)
+            )
+        ''')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def статті(self, site):
+        rows = self.conn.execute('SELECT url, title, attempts FROM retry WHERE site = ? ORDER BY rowid', (site,))
+        return [{'url': url, 'title': title, 'attempts': attempts} for url, title, attempts in rows]
+
+    def відкласти(self, site, article, error):
+        # Лічильник спроб збільшується в самій базі: стаття, що досі є у
+        # списку новин, приходить звідти без 'attempts', а не з черги
+        with self.conn:
+            self.conn.execute('''
+                INSERT INTO retry (site, url, title, attempts, last_error) VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (site, url) DO UPDATE SET
+                    title = excluded.title, attempts = attempts + 1, last_error = excluded.last_error
+            ''', (site, article['url'], article['title'], str(error)))
+            return self.conn.execute('SELECT attempts FROM retry WHERE site = ? AND url = ?',
+                                     (site, article['url'])).fetchone()[0]
+
+    def видалити(self, site, urls):
+        with self.conn:
+            self.conn.executemany('DELETE FROM retry WHERE site = ? AND url = ?', ((site, url) for url in urls))
+
+    def очистити(self, site):
+        with self.conn:
+            self.conn.execute('DELETE FROM retry WHERE site = ?', (site,))
@@ -0,0 +1,137 @@
+import json
+import atexit
+import asyncio
+import logging
+import threading
+
+from . import engine, storage
+from .archive import ущільнення
+from .backfill import дозавантаження
+from .resilience import HostRateLimiter
+
+# Довгоживуче середовище виконання: один цикл подій, одна сесія aiohttp з пулом
+# з'єднань, один пул потоків розбору і спільний ліміт запитів на хост на весь
+# час життя процесу (клієнт Sheets кешується в scraper.sheets).
+#
+# Однакові запити, що надходять, поки такий самий запуск ще триває (cron і
+# кнопка в index.html одночасно), отримують результат цього запуску, а не
+# запускають ще один. Різні запуски виконуються по черзі, бо спільно
+# використовують локальний стан (індекс дублікатів, стан списків, чергу повторів).
+#
+# Зі сховищем SCRAPE_STORAGE=sqlite черга змін для Google Sheets доставляється
+# фоновим завданням після запусків, тож запуск не чекає на API таблиці.
+class Runtime:
+    def __init__(self):
+        self.session = None
+        self.executor = None
+        self.limiter = None
+        self.coalesced = 0
+        self._inflight = {}
+        self._lock = None
+        self._mirror = None
+        self._mirror_again = False
+
+    async def запустити(self):
+        if self.session is None:
+            self.executor = engine.створити_пул_розбору()
+            self.session = engine.створити_сесію()
+            self.limiter = HostRateLimiter()
+            self._lock = asyncio.Lock()
+        return self
+
+    async def закрити(self):
+        if self._mirror is not None:
+            await self._mirror
+        if self.session is not None:
+            await self.session.close()
+            self.executor.shutdown(wait=True)
+            self.session = self.executor = self.limiter = None
+
+    async def __aenter__(self):
+        return await self.запустити()
+
+    async def __aexit__(self, *exc):
+        await self.закрити()
+
+    async def виконати(self, kind, site_names=None, **options):
+        # kind: 'scrape', 'first', 'backfill' або 'compact'; повертає JSON-рядок відповіді
+        await self.запустити()
+        key = (kind, tuple(site_names) if isinstance(site_names, (list, tuple)) else site_names,
+               tuple(sorted(options.items())))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._виконати(kind, site_names, options))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+            logging.info(f"Запит {kind} {site_names} приєднано до запуску, що вже триває")
+        # shield: якщо клієнт відʼєднався, спільний запуск для інших не скасовується
+        return await asyncio.shield(task)
+
+    def віддзеркалити(self):
+        # Запланувати доставку черги дзеркала; якщо вона вже триває — ще один прохід після неї
+        if self._mirror is not None and not self._mirror.done():
+            self._mirror_again = True
+            return
+        self._mirror = asyncio.ensure_future(self._віддзеркалити())
+
+    async def дочекатися_дзеркала(self):
+        # Доставити всю чергу дзеркала фоновим завданням і дочекатися його
+        self.віддзеркалити()
+        await asyncio.shield(self._mirror)
+
+    async def _віддзеркалити(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._mirror_again = False
+            try:
+                # Без копіювання контексту: доставка не належить до метрик запуску, що її запланував
+                delivered = await loop.run_in_executor(None, storage.віддзеркалити_сховище)
+                if delivered:
+                    logging.info(f"Дзеркало Google Sheets: доставлено {delivered} змін")
+            except Exception as e:
+                logging.error(f"Помилка дзеркала Google Sheets: {e}")
+            if not self._mirror_again:
+                return
+
+    async def _виконати(self, kind, site_names, options):
+        async with self._lock:
+            if kind == 'backfill':
+                return await дозавантаження(site_names, runtime=self, **options)
+            if kind == 'compact':
+                # Ущільнення потребує порожньої черги дзеркала: її доставляє те
+                # саме фонове завдання, а не окремий прохід з іншого сховища
+                await self.дочекатися_дзеркала()
+                return await ущільнення(site_names, runtime=self, **options)
+            if kind in ('scrape', 'first'):
+                return await engine.скрапінг(site_names, kind == 'first', runtime=self)
+            return json.dumps({"error": f"Невідомий тип запуску: {kind}"})
+
+# Для синхронного BaseHTTPRequestHandler (Vercel): Runtime живе у фоновому
+# потоці зі своїм циклом подій, який переживає «теплі» виклики функції, а
+# обробник лише передає туди корутину й чекає на результат.
+_фоновий = None
+_фоновий_lock = threading.Lock()
+
+def фоновий_runtime():
+    global _фоновий
+    with _фоновий_lock:
+        if _фоновий is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='scraper-runtime', daemon=True).start()
+            _фоновий = (loop, Runtime())
+            atexit.register(_закрити_фоновий)
+        return _фоновий
+
+def _закрити_фоновий():
+    loop, runtime = _фоновий
+    try:
+        asyncio.run_coroutine_threadsafe(runtime.закрити(), loop).result(timeout=5)
+    except Exception as e:
+        logging.warning(f"Не вдалося закрити фоновий runtime: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+
+def виконати_синхронно(kind, site_names=None, **options):
+    loop, runtime = фоновий_runtime()
+    return asyncio.run_coroutine_threadsafe(runtime.виконати(kind, site_names, **options), loop).result()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from .sites import вибрати_сайти
+from .state import шлях_стану
+
+# Адаптивне опитування: після кожного запуску для сайту записується кількість
+# нових статей, з неї оцінюється темп публікацій за годинами доби, а наступне
+# опитування призначається тоді, коли в середньому має з'явитися POLL_TARGET
+# нових статей — але не раніше ніж через POLL_MIN і не пізніше ніж через
+# POLL_MAX секунд. Уночі сайти опитуються рідко, у пікові години — часто.
+POLL_MIN = float(os.environ.get('SCRAPE_POLL_MIN', 60))
+POLL_MAX = float(os.environ.get('SCRAPE_POLL_MAX', 3600))
+POLL_TARGET = float(os.environ.get('SCRAPE_POLL_TARGET', 3))
+# Вага нового спостереження за годину спостереження (експоненційне згладжування)
+RATE_SMOOTHING = 0.3
+# Сайти, чий час настає в межах цього вікна, опитуються одним запуском
+GROUP_WINDOW = 5.0
+# Історія опитувань зберігається стільки днів
+HISTORY_DAYS = 30
+
+def години_інтервалу(start, end):
+    # (година доби, скільки годин інтервалу на неї припадає) для [start, end]
+    # у місцевому часі; інтервали, довші за добу, обрізаються до останньої доби
+    start = max(start, end - 86400)
+    while start < end:
+        moment = time.localtime(start)
+        hour_end = min(end, start + 3600 - moment.tm_min * 60 - moment.tm_sec)
+        yield moment.tm_hour, (hour_end - start) / 3600
+        start = hour_end
+
+# Історія опитувань і згладжений темп публікацій (статей на годину) для
+# кожної години доби кожного сайту в SQLite.
+class PublishRate:
+    def __init__(self, path=None):
+        self.conn = sqlite3.connect(path or шлях_стану('schedule.sqlite3'), timeout=30)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS polls (
+                site TEXT NOT NULL,
+                polled_at REAL NOT NULL,
+                new_articles INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS polls_site ON polls (site, polled_at);
+            CREATE TABLE IF NOT EXISTS rates (
+                site TEXT NOT NULL,
+                hour INTEGER NOT NULL,
+                rate REAL NOT NULL,
+                observed_hours REAL NOT NULL,
+                PRIMARY KEY (site, hour)
+            );
+        ''')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def записати(self, site, polled_at, new_articles):
+        # Статті, знайдені цим опитуванням, з'явилися після попереднього:
+        # темп за цей інтервал розподіляється між годинами доби, які він покриває
+        previous = self.conn.execute('SELECT MAX(polled_at) FROM polls WHERE site = ?', (site,)).fetchone()[0]
+        with self.conn:
+            self.conn.execute('INSERT INTO polls (site, polled_at, new_articles) VALUES (?, ?, ?)',
+                              (site, polled_at, new_articles))
+            self.conn.execute('DELETE FROM polls WHERE site = ? AND polled_at < ?', (site, polled_at - HISTORY_DAYS * 86400))
+            if previous is None or polled_at <= previous:
+                return
+            observed = min(polled_at - previous, 86400) / 3600
+            rate = new_articles / observed
+            for hour, hours in години_інтервалу(previous, polled_at):
+                weight = 1 - (1 - RATE_SMOOTHING) ** hours
+                self.conn.execute('''
+                    INSERT INTO rates (site, hour, rate, observed_hours) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (site, hour) DO UPDATE SET
+                        rate = rate + ? * (excluded.rate - rate),
+                        observed_hours = observed_hours + excluded.observed_hours
+                ''', (site, hour, rate, hours, weight))
+
+    def темпи(self, site):
+        # {година: статей на годину}; години без спостережень — середній темп сайту
+        rates = dict(self.conn.execute('SELECT hour, rate FROM rates WHERE site = ?', (site,)))
+        if not rates:
+            return None
+        mean = sum(rates.values()) / len(rates)
+        return [rates.get(hour, mean) for hour in range(24)]
+
+    def наступний_інтервал(self, site, now=None):
+        # Час, за який очікувана кількість нових статей досягне POLL_TARGET,
+        # з інтегруванням темпу по годинах доби, в межах [POLL_MIN, POLL_MAX].
+        # Поки історії немає — POLL_MIN, щоб швидше її набрати.
+        rates = self.темпи(site)
+        if rates is None:
+            return POLL_MIN
+        now = time.time() if now is None else now
+        expected = elapsed = 0.0
+        for hour, hours in години_інтервалу(now, now + POLL_MAX):
+            rate = rates[hour]
+            if rate > 0 and expected + rate * hours >= POLL_TARGET:
+                return max(elapsed + (POLL_TARGET - expected) / rate * 3600, POLL_MIN)
+            expected += rate * hours
+            elapsed += hours * 3600
+        return POLL_MAX
+
+def нових_статей(response, site_names):
+    # {сайт: кількість нових статей} з JSON-відповіді скрапінгу; сайти з
+    # помилкою пропускаються, щоб не записати хибний нуль
+    per_site = response.get('sites') if 'sites' in response else {site_names[0]: response}
+    return {name: result['added'] for name, result in per_site.items() if 'added' in result}
+
+async def адаптивне_опитування(runtime, site_names, stop):
+    # Один цикл подій для всіх сайтів: кожен має свій час наступного
+    # опитування, а сайти, чий час настав майже одночасно, обробляються одним
+    # запуском (спільна сесія, один запис у таблицю)
+    sites = [site.name for site in вибрати_сайти(site_names)]
+    loop = asyncio.get_running_loop()
+    next_poll = {name: loop.time() for name in sites}
+    with PublishRate() as rates:
+        while not stop.is_set():
+            wait = min(next_poll.values()) - loop.time()
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due = [name for name in sites if next_poll[name] <= loop.time() + GROUP_WINDOW]
+            polled_at = time.time()
+            try:
+                added = нових_статей(json.loads(await runtime.виконати('scrape', due)), due)
+            except Exception as e:
+                logging.error(f"Помилка опитування {', '.join(due)}: {e}")
+                added = {}
+            for name in due:
+                if name in added:
+                    rates.записати(name, polled_at, added[name])
+                interval = rates.наступний_інтервал(name)
+                next_poll[name] = loop.time() + interval
+                logging.info(f"[{name}] Нових статей: {added.get(name, '—')}, наступне опитування через {interval:.0f} с")
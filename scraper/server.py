@@ -0,0 +1,117 @@
+import os
+import sys
+import signal
+import asyncio
+import logging
+import argparse
+
+from aiohttp import web
+
+from .handler import параметри_запиту, відповідь_з_помилкою
+from .metrics import prometheus
+from .runtime import Runtime
+from .scheduler import POLL_MAX, POLL_MIN, адаптивне_опитування
+
+# Режим довгоживучого сервера для власних хостів: той самий HTTP API, що й
+# функції Vercel, але з одним циклом подій, сесією і клієнтом Sheets на весь
+# процес, плюс (за бажанням) опитування сайтів: з фіксованим інтервалом або
+# адаптивне, за темпом публікацій кожного сайту (scraper.scheduler).
+#
+#   python -m scraper.server --port 8000
+#   python -m scraper.server --poll 30 --sites all --no-http
+#   python -m scraper.server --adaptive --sites all
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Ті самі маршрути й сайти за замовчуванням, що й у vercel.json
+ROUTES = {
+    '/api/scrape': ['babel'],
+    '/api/scrape_apostrophe': ['apostrophe'],
+}
+
+def створити_застосунок(runtime):
+    async def scrape(request):
+        if request.query.get('type') == 'metrics':
+            return await metrics(request)
+        query = {key: request.query.getall(key) for key in request.query.keys()}
+        try:
+            kind, site_names, options = параметри_запиту(query, ROUTES[request.path])
+            result = await runtime.виконати(kind, site_names, **options)
+        except Exception as e:
+            return web.Response(status=500, text=відповідь_з_помилкою(e), content_type='application/json')
+        return web.Response(text=result, content_type='application/json')
+
+    async def metrics(request):
+        return web.Response(text=prometheus(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Prometheus-Version': '0.0.4'})
+
+    async def index(request):
+        return web.FileResponse(os.path.join(ROOT, 'index.html'))
+
+    app = web.Application()
+    for path in ROUTES:
+        app.router.add_get(path, scrape)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/', index)
+    return app
+
+async def опитування(runtime, site_names, interval, stop):
+    # Регулярний скрапінг кожні interval секунд; запуск без змін (304) не
+    # звертається до Sheets, тож короткий інтервал майже нічого не коштує
+    while not stop.is_set():
+        try:
+            await runtime.виконати('scrape', site_names)
+        except Exception as e:
+            logging.error(f"Помилка опитування: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def запустити_сервер(host='127.0.0.1', port=8000, poll=0.0, site_names=None, http=True, adaptive=False):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    async with Runtime() as runtime:
+        runner = None
+        if http:
+            runner = web.AppRunner(створити_застосунок(runtime), access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, host, port).start()
+            logging.info(f"Сервер скрапера слухає http://{host}:{port}")
+        tasks = []
+        if adaptive:
+            logging.info(f"Адаптивне опитування {site_names or 'all'}: інтервал {POLL_MIN:g}–{POLL_MAX:g} с")
+            tasks.append(asyncio.create_task(адаптивне_опитування(runtime, site_names, stop)))
+        elif poll:
+            logging.info(f"Опитування {site_names or 'all'} кожні {poll:g} с")
+            tasks.append(asyncio.create_task(опитування(runtime, site_names, poll, stop)))
+        await stop.wait()
+        logging.info("Зупинка сервера скрапера")
+        await asyncio.gather(*tasks)
+        if runner is not None:
+            await runner.cleanup()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Довгоживучий сервер і демон опитування скрапера")
+    parser.add_argument('--host', default=os.environ.get('SCRAPE_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SCRAPE_PORT', 8000)))
+    parser.add_argument('--poll', type=float, default=float(os.environ.get('SCRAPE_POLL_INTERVAL', 0)),
+                        help="Інтервал опитування сайтів, с (0 — без опитування)")
+    parser.add_argument('--adaptive', action='store_true', default=os.environ.get('SCRAPE_POLL_ADAPTIVE') == '1',
+                        help="Інтервал опитування кожного сайту за його темпом публікацій "
+                             "(межі SCRAPE_POLL_MIN/SCRAPE_POLL_MAX)")
+    parser.add_argument('--sites', nargs='+', default=['all'], help="Сайти для опитування")
+    parser.add_argument('--no-http', action='store_true', help="Лише опитування, без HTTP API")
+    args = parser.parse_args(argv)
+    if args.no_http and not (args.poll or args.adaptive):
+        parser.error("--no-http потребує --poll або --adaptive")
+    asyncio.run(запустити_сервер(args.host, args.port, args.poll, args.sites, not args.no_http, args.adaptive))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import os
+import json
+import logging
+import threading
+
+from .metrics import етап, лічильник
+from .resilience import виконати_з_повторами
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+STATUSES = ["Неопубліковано", "Опубліковано", "Забраковано"]
+# Скільки рядків після останнього заповненого отримують випадаючий список статусів
+VALIDATION_ROWS = int(os.environ.get('SCRAPE_VALIDATION_ROWS', 1000))
+
+# Клієнт Sheets живе на рівні модуля, тож «теплі» виклики serverless-функції
+# не розбирають облікові дані й документ discovery повторно
+_клієнт = None
+_ключ_клієнта = None
+_потоки = threading.local()
+
+def _http_потоку(credentials):
+    # httplib2.Http не потокобезпечний, а запис іде з пулу потоків: кожен потік
+    # тримає власне з'єднання, а клієнт і токен спільні
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+
+    http = getattr(_потоки, 'http', None)
+    if http is None:
+        http = _потоки.http = AuthorizedHttp(credentials, http=httplib2.Http())
+    return http
+
+def налаштувати_sheets():
+    global _клієнт, _ключ_клієнта
+    try:
+        creds_json = os.environ['GOOGLE_APPLICATION_CREDENTIALS']
+        if _клієнт is not None and _ключ_клієнта == creds_json:
+            return _клієнт
+        # Важкі бібліотеки Google імпортуються лише тоді, коли таблиця справді потрібна
+        from google.oauth2.service_account import Credentials
+        from googleapiclient.discovery import build
+        from googleapiclient.http import HttpRequest
+
+        creds = Credentials.from_service_account_info(json.loads(creds_json), scopes=SCOPES)
+        # Документ discovery для sheets v4 постачається разом з бібліотекою,
+        # тож мережевого запиту за ним немає
+        service = build(
+            'sheets', 'v4', credentials=creds, static_discovery=True, cache_discovery=False,
+            requestBuilder=lambda http, *args, **kwargs: HttpRequest(_http_потоку(creds), *args, **kwargs),
+        )
+        _клієнт, _ключ_клієнта = service.spreadsheets(), creds_json
+        logging.info("Успішно налаштовано сервіс Google Sheets")
+        return _клієнт
+    except Exception as e:
+        logging.error(f"Помилка налаштування Google Sheets: {e}")
+        raise
+
+def _клітинка(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return {'userEnteredValue': {'stringValue': str(value)}}
+    return {'userEnteredValue': {'numberValue': value}}
+
+def запит_випадаючого_списку(sheet_id, start_row=1, end_row=None):
+    return {
+        "setDataValidation": {
+            "range": {
+                "sheetId": sheet_id,
+                "startRowIndex": start_row,
+                "endRowIndex": end_row or VALIDATION_ROWS,
+                "startColumnIndex": 1,
+                "endColumnIndex": 2
+            },
+            "rule": {
+                "condition": {
+                    "type": "ONE_OF_LIST",
+                    "values": [{"userEnteredValue": status} for status in STATUSES]
+                },
+                "showCustomUi": True,
+                "strict": True
+            }
+        }
+    }
+
+def запит_зняття_списку(sheet_id, start_row):
+    # Без rule setDataValidation знімає перевірку; діапазон — до кінця листа
+    return {
+        "setDataValidation": {
+            "range": {
+                "sheetId": sheet_id,
+                "startRowIndex": start_row,
+                "startColumnIndex": 1,
+                "endColumnIndex": 2
+            }
+        }
+    }
+
+def запит_видалення_рядків(sheet_id, start_row, end_row):
+    return {
+        "deleteDimension": {
+            "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": start_row, "endIndex": end_row}
+        }
+    }
+
+def запит_додавання_рядків(sheet_id, count):
+    return {"appendDimension": {"sheetId": sheet_id, "dimension": "ROWS", "length": count}}
+
+# Обгортка над spreadsheets(), що тримає метадані таблиці протягом запуску
+# і складає всі зміни в мінімальну кількість запитів до API.
+class SheetsWriter:
+    # sheet — ресурс spreadsheets() або функція, що його створює. Функція
+    # викликається лише при першому запиті, тож запуск без нових статей
+    # не витрачає час на клієнт Google зовсім.
+    def __init__(self, sheet, spreadsheet_id):
+        self._sheet = sheet
+        self.spreadsheet_id = spreadsheet_id
+        self.api_calls = 0
+        self._sheet_ids = None
+        self._row_counts = {}
+
+    @property
+    def sheet(self):
+        if callable(self._sheet):
+            self._sheet = self._sheet()
+        return self._sheet
+
+    def _виконати(self, request):
+        self.api_calls += 1
+        лічильник('sheets_api_calls')
+        with етап('sheets_execute'):
+            return виконати_з_повторами(request)
+
+    def ідентифікатори_листів(self):
+        if self._sheet_ids is None:
+            metadata = self._виконати(self.sheet.get(
+                spreadsheetId=self.spreadsheet_id,
+                fields='sheets.properties(sheetId,title,gridProperties.rowCount)'
+            ))
+            self._sheet_ids = {s['properties']['title']: s['properties']['sheetId'] for s in metadata.get('sheets', [])}
+            self._row_counts = {s['properties']['title']: s['properties'].get('gridProperties', {}).get('rowCount', 0)
+                                for s in metadata.get('sheets', [])}
+        return self._sheet_ids
+
+    def кількість_рядків(self, name):
+        # Розмір сітки листа на момент читання метаданих (разом з порожніми рядками)
+        self.ідентифікатори_листів()
+        return self._row_counts.get(name, 0)
+
+    def забезпечити_листи(self, names):
+        sheet_ids = self.ідентифікатори_листів()
+        missing = [name for name in dict.fromkeys(names) if name not in sheet_ids]
+        if not missing:
+            return sheet_ids
+        logging.info(f"Створюємо листи: {', '.join(missing)}")
+        try:
+            reply = self._виконати(self.sheet.batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'requests': [{'addSheet': {'properties': {'title': name}}} for name in missing]}
+            ))
+        except Exception as error:
+            logging.error(f"Виникла помилка при створенні листів: {error}")
+            raise
+        for item in reply.get('replies', []):
+            properties = item['addSheet']['properties']
+            sheet_ids[properties['title']] = properties['sheetId']
+            self._row_counts[properties['title']] = properties.get('gridProperties', {}).get('rowCount', 1000)
+        return sheet_ids
+
+    def прочитати(self, ranges):
+        try:
+            result = self._виконати(self.sheet.values().batchGet(spreadsheetId=self.spreadsheet_id, ranges=ranges))
+        except Exception as error:
+            logging.error(f"Виникла помилка при читанні листів: {error}")
+            raise
+        return [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+
+    def очистити(self, ranges):
+        try:
+            self._виконати(self.sheet.values().batchClear(spreadsheetId=self.spreadsheet_id, body={'ranges': ranges}))
+        except Exception as error:
+            logging.error(f"Виникла помилка при очищенні листів: {error}")
+            raise
+
+    def записати(self, rows_by_sheet, extra_requests=()):
+        # Один batchUpdate з appendCells для кожного листа: кількість запитів
+        # не залежить від кількості статей.
+        rows_by_sheet = {name: rows for name, rows in rows_by_sheet.items() if rows}
+        requests = []
+        updated_cells = 0
+        if rows_by_sheet:
+            sheet_ids = self.забезпечити_листи(rows_by_sheet)
+            for name, rows in rows_by_sheet.items():
+                requests.append({
+                    'appendCells': {
+                        'sheetId': sheet_ids[name],
+                        'rows': [{'values': [_клітинка(value) for value in row]} for row in rows],
+                        'fields': 'userEnteredValue'
+                    }
+                })
+                updated_cells += sum(len(row) for row in rows)
+        requests.extend(extra_requests)
+        if not requests:
+            return 0
+        try:
+            self._виконати(self.sheet.batchUpdate(spreadsheetId=self.spreadsheet_id, body={'requests': requests}))
+        except Exception as error:
+            logging.error(f"Виникла помилка при збереженні статей: {error}")
+            raise
+        return updated_cells
@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field
+from urllib.parse import urljoin
+
+
+# Декларативний опис сайту: звідки брати список новин, як знайти посилання
+# і текст статті, та в який лист записувати оброблені статті.
+@dataclass(frozen=True)
+class SiteAdapter:
+    name: str
+    listing_url: str
+    base_url: str
+    item_selector: str
+    link_selector: str
+    body_tag: str
+    body_attrs: dict = field(default_factory=dict)
+    processed_sheet: str = 'ProcessedArticles'
+    # Список новин відсортовано від нових до старих, тож розбір можна
+    # зупинити на першому вже відомому посиланні
+    newest_first: bool = True
+    # Шаблони сторінок архіву для дозавантаження: {page} — номер сторінки списку,
+    # {date} — дата (datetime.date) для архіву за днями
+    page_url_template: str = None
+    archive_url_template: str = None
+
+    def нормалізувати_url(self, href):
+        return urljoin(self.base_url, href)
+
+
+BABEL = SiteAdapter(
+    name='babel',
+    listing_url="https://babel.ua/news",
+    base_url="https://babel.ua",
+    item_selector="div.c-entry-content-box",
+    link_selector="h3.c-entry-title a",
+    body_tag='div',
+    body_attrs={'class': 'c-post-text js-article-content'},
+    processed_sheet='ProcessedArticles',
+    page_url_template="https://babel.ua/news?page={page}",
+)
+
+APOSTROPHE = SiteAdapter(
+    name='apostrophe',
+    listing_url="https://apostrophe.ua/ua/news",
+    base_url="https://apostrophe.ua",
+    item_selector="div.entry_news",
+    link_selector="a",
+    body_tag='div',
+    body_attrs={'itemprop': 'articleBody'},
+    processed_sheet='ArticlesApostroph',
+    page_url_template="https://apostrophe.ua/ua/news?page={page}",
+    archive_url_template="https://apostrophe.ua/ua/news/{date:%Y-%m-%d}",
+)
+
+SITES = {site.name: site for site in (BABEL, APOSTROPHE)}
+
+
+def вибрати_сайти(names=None):
+    if not names or 'all' in names:
+        return list(SITES.values())
+    unknown = [name for name in names if name not in SITES]
+    if unknown:
+        raise ValueError(f"Невідомі сайти: {', '.join(unknown)}")
+    return [SITES[name] for name in names]
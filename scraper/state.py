@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Локальний стан між запусками (індекси, кеші, контрольні точки). На Vercel
+# записувати можна лише в /tmp, тож за замовчуванням стан живе там і
+# зберігається, поки інстанс функції «теплий».
+STATE_DIR = os.environ.get('SCRAPER_STATE_DIR', os.path.join(tempfile.gettempdir(), 'newsscrape'))
+
+def шлях_стану(name):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, name)
@@ -0,0 +1,447 @@
+import argparse
+import contextlib
+import functools
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from .dedup import ключ_url
+from .metrics import етап, лічильник, у_потоці
+from .sheets import SheetsWriter, налаштувати_sheets
+from .state import STATE_DIR, шлях_стану
+
+# Де зберігаються статті: 'sheets' — безпосередньо в Google Sheets (як і
+# раніше), 'sqlite' — у локальній базі (STORAGE_PATH), яка стає основним
+# сховищем, а Google Sheets (якщо задано SPREADSHEET_ID) — її асинхронним
+# дзеркалом: запис порції не чекає на API, а зміни доставляються з черги
+# окремо і переживають помилки й квоти. Без SPREADSHEET_ID режим 'sqlite'
+# працює зовсім без Google. База за замовчуванням — articles.sqlite3 у
+# каталозі стану. Локальна база має жити між запусками, тож на
+# Vercel (де /tmp зникає з інстансом) лишайте 'sheets'.
+STORAGE = os.environ.get('SCRAPE_STORAGE', 'sheets')
+STORAGE_PATH = os.environ.get('SCRAPE_STORAGE_PATH')
+EXPORT_DIR = os.environ.get('SCRAPE_EXPORT_DIR', os.path.join(STATE_DIR, 'export'))
+# Скільки рядків звичайних дописувань з черги дзеркала об'єднувати в один batchUpdate
+MIRROR_BATCH_ROWS = int(os.environ.get('SCRAPE_MIRROR_BATCH_ROWS', 2000))
+# Скільки секунд діє право на доставку черги, якщо його не поновлюють (доставник
+# упав): поки воно діє, інші екземпляри й процеси чергу не доставляють
+MIRROR_LEASE = 300
+
+LINK_COLUMN = 2
+
+_RANGE = re.compile(r"^'?(?P<sheet>.+?)'?(?:!(?P<c1>[A-Z]*)(?P<r1>\d*)(?::(?P<c2>[A-Z]*)(?P<r2>\d*))?)?$")
+
+def _стовпець(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number - 1
+
+def розібрати_діапазон(range_name):
+    # A1-нотація: 'Лист!C5:C' -> (лист, перший рядок, останній рядок або None,
+    # перша колонка, колонка після останньої або None), рядки й колонки з нуля
+    match = _RANGE.match(range_name)
+    if match is None:
+        raise ValueError(f"Некоректний діапазон: {range_name}")
+    c1, r1, c2, r2 = match.group('c1', 'r1', 'c2', 'r2')
+    if c2 is None:
+        # Одна клітинка або колонка ('A1', 'C') чи весь лист
+        c2, r2 = c1, r1
+    return (match.group('sheet'), int(r1) - 1 if r1 else 0, int(r2) if r2 else None,
+            _стовпець(c1) if c1 else 0, _стовпець(c2) + 1 if c2 else None)
+
+def _обрізати(values):
+    # Як і Sheets API: без порожніх клітинок у кінці рядка і порожніх рядків у кінці
+    values = [list(row) for row in values]
+    for row in values:
+        while row and row[-1] in ("", None):
+            row.pop()
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+@functools.lru_cache(maxsize=None)
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        logging.warning("pyarrow не встановлено, замість Parquet записуємо JSONL")
+        return None
+    return pyarrow
+
+def записати_файл(base, header, rows, target):
+    # Рядки як записи {колонка заголовка: значення}: 'parquet' — окремий файл
+    # (потрібен pyarrow), 'jsonl' — дописування в .jsonl.gz (члени gzip можна
+    # дописувати в кінець файлу). Повертає шлях до файлу.
+    pa = _pyarrow() if target == 'parquet' else None
+    if pa is None:
+        target = 'jsonl'
+    width = max([len(header)] + [len(row) for row in rows])
+    columns = list(header) + [f'column_{number + 1}' for number in range(len(header), width)]
+    records = [dict(zip(columns, row)) for row in rows]
+    if target == 'parquet':
+        path = f'{base}.parquet'
+        table = pa.table({column: [str(record.get(column, "")) for record in records] for column in columns})
+        pa.parquet.write_table(table, path, compression='zstd')
+    else:
+        path = f'{base}.jsonl.gz'
+        with gzip.open(path, 'at', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return path
+
+# Локальне сховище з тим самим інтерфейсом, що й SheetsWriter (листи, рядки,
+# діапазони в A1-нотації, batchUpdate-запити видалення рядків), тож рушій,
+# індекс дублікатів, дозавантаження й ущільнення працюють з ним без змін.
+# Рядки зберігаються в SQLite у режимі WAL, дописуються однією транзакцією
+# на порцію і мають індекс за ключем URL з колонки «Посилання».
+#
+# З mirror (SheetsWriter) кожна зміна в тій самій транзакції потрапляє в
+# чергу outbox, яку віддзеркалити() доставляє в Google Sheets. Доставляє
+# завжди хтось один (фонове дзеркало Runtime, ущільнення чи CLI), тримаючи
+# право на доставку в таблиці mirror_lease, інакше зміни дописались би двічі.
+class LocalStore:
+    def __init__(self, path=None, mirror=None):
+        self.path = path or STORAGE_PATH or шлях_стану('articles.sqlite3')
+        self.mirror = mirror
+        self.spreadsheet_id = f'sqlite:{os.path.abspath(self.path)}'
+        self.api_calls = 0
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Запис іде з пулу потоків, читання — з циклу подій; доступ серіалізує _lock
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS sheets (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS rows (
+                sheet INTEGER NOT NULL,
+                row INTEGER NOT NULL,
+                url_key BLOB,
+                data TEXT NOT NULL,
+                PRIMARY KEY (sheet, row)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS rows_url ON rows (url_key) WHERE url_key IS NOT NULL;
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY,
+                op TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS mirror_lease (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                owner TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+        ''')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def ідентифікатори_листів(self):
+        with self._lock:
+            return {title: sheet_id for sheet_id, title in self.conn.execute('SELECT id, title FROM sheets')}
+
+    def забезпечити_листи(self, names):
+        with self._lock, self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO sheets (title) VALUES (?)', [(name,) for name in names])
+            return self.ідентифікатори_листів()
+
+    def _рядків(self, sheet_id):
+        return self.conn.execute('SELECT COALESCE(MAX(row) + 1, 0) FROM rows WHERE sheet = ?', (sheet_id,)).fetchone()[0]
+
+    def кількість_рядків(self, name):
+        # Розмір сітки визначає Sheets; без дзеркала сітка — це заповнені рядки
+        if self.mirror is not None:
+            return self.mirror.кількість_рядків(name)
+        sheet_id = self.ідентифікатори_листів().get(name)
+        with self._lock:
+            return 0 if sheet_id is None else self._рядків(sheet_id)
+
+    def прочитати(self, ranges):
+        with self._lock:
+            sheet_ids = self.ідентифікатори_листів()
+            tables = []
+            for range_name in ranges:
+                name, first_row, end_row, first_column, end_column = розібрати_діапазон(range_name)
+                if name not in sheet_ids:
+                    raise ValueError(f"Немає листа {name}")
+                query = 'SELECT row, data FROM rows WHERE sheet = ? AND row >= ?'
+                params = [sheet_ids[name], first_row]
+                if end_row is not None:
+                    query += ' AND row < ?'
+                    params.append(end_row)
+                values = []
+                for row, data in self.conn.execute(query + ' ORDER BY row', params):
+                    # Пропущені номери — порожні рядки, як у таблиці
+                    values.extend([] for _ in range(row - first_row - len(values)))
+                    values.append(json.loads(data)[first_column:end_column])
+                tables.append(_обрізати(values))
+            return tables
+
+    def _у_чергу(self, op):
+        if self.mirror is not None:
+            self.conn.execute('INSERT INTO outbox (op) VALUES (?)', (json.dumps(op, ensure_ascii=False),))
+
+    def очистити(self, ranges):
+        with self._lock, self.conn:
+            sheet_ids = self.ідентифікатори_листів()
+            for range_name in ranges:
+                name, first_row, end_row, first_column, end_column = розібрати_діапазон(range_name)
+                if name not in sheet_ids:
+                    continue
+                query = 'SELECT row, data FROM rows WHERE sheet = ? AND row >= ?'
+                params = [sheet_ids[name], first_row]
+                if end_row is not None:
+                    query += ' AND row < ?'
+                    params.append(end_row)
+                updates = []
+                for row, data in self.conn.execute(query, params).fetchall():
+                    cells = json.loads(data)
+                    cells[first_column:end_column] = [""] * len(cells[first_column:end_column])
+                    updates.append((row, cells))
+                for row, cells in updates:
+                    if any(cell not in ("", None) for cell in cells):
+                        self.conn.execute('UPDATE rows SET data = ?, url_key = ? WHERE sheet = ? AND row = ?',
+                                          (json.dumps(cells, ensure_ascii=False), self._ключ(cells), sheet_ids[name], row))
+                    else:
+                        self.conn.execute('DELETE FROM rows WHERE sheet = ? AND row = ?', (sheet_ids[name], row))
+            self._у_чергу({'clear': list(ranges)})
+
+    @staticmethod
+    def _ключ(row):
+        url = row[LINK_COLUMN] if len(row) > LINK_COLUMN else None
+        return ключ_url(url) if isinstance(url, str) and url.startswith('http') else None
+
+    def _видалити_рядки(self, sheet_id, start, end):
+        # Зсув наступних рядків угору в два кроки, щоб не порушити первинний ключ
+        self.conn.execute('DELETE FROM rows WHERE sheet = ? AND row >= ? AND row < ?', (sheet_id, start, end))
+        self.conn.execute('UPDATE rows SET row = -(row - ?) - 1 WHERE sheet = ? AND row >= ?', (end - start, sheet_id, end))
+        self.conn.execute('UPDATE rows SET row = -row - 1 WHERE sheet = ? AND row < 0', (sheet_id,))
+
+    def записати(self, rows_by_sheet, extra_requests=()):
+        # Ті самі аргументи, що й у SheetsWriter.записати(). Із запитів
+        # batchUpdate виконується лише deleteDimension: оформлення і перевірка
+        # даних мають сенс тільки в Sheets і доставляються туди через дзеркало.
+        rows_by_sheet = {name: rows for name, rows in rows_by_sheet.items() if rows}
+        updated_cells = 0
+        with self._lock, self.conn:
+            sheet_ids = self.забезпечити_листи(rows_by_sheet) if rows_by_sheet else self.ідентифікатори_листів()
+            for name, rows in rows_by_sheet.items():
+                start = self._рядків(sheet_ids[name])
+                self.conn.executemany(
+                    'INSERT INTO rows (sheet, row, url_key, data) VALUES (?, ?, ?, ?)',
+                    [(sheet_ids[name], start + offset, self._ключ(row), json.dumps(row, ensure_ascii=False))
+                     for offset, row in enumerate(rows)])
+                updated_cells += sum(len(row) for row in rows)
+            for request in extra_requests:
+                if 'deleteDimension' in request and request['deleteDimension']['range'].get('dimension') == 'ROWS':
+                    target = request['deleteDimension']['range']
+                    self._видалити_рядки(target['sheetId'], target['startIndex'], target['endIndex'])
+            if rows_by_sheet or extra_requests:
+                titles = {sheet_id: title for title, sheet_id in sheet_ids.items()}
+                self._у_чергу({'rows': rows_by_sheet, 'requests': _замінити_листи(list(extra_requests), titles)})
+        return updated_cells
+
+    def знайти(self, url):
+        # Листи й номери рядків (з нуля), де є стаття з таким URL
+        with self._lock:
+            return self.conn.execute(
+                'SELECT sheets.title, rows.row FROM rows JOIN sheets ON sheets.id = rows.sheet WHERE url_key = ?',
+                (ключ_url(url),)).fetchall()
+
+    def в_черзі(self):
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def _право_доставки(self, owner):
+        # Взяти або поновити право на доставку черги; False — його тримає інший
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute('''
+                INSERT INTO mirror_lease (id, owner, expires) VALUES (0, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+                WHERE mirror_lease.owner = excluded.owner OR mirror_lease.expires < ?
+            ''', (owner, now + MIRROR_LEASE, now))
+            return self.conn.execute('SELECT owner FROM mirror_lease').fetchone()[0] == owner
+
+    def віддзеркалити(self, max_ops=None):
+        # Доставляє чергу змін у Google Sheets по порядку. Послідовні дописування
+        # без інших запитів об'єднуються в один batchUpdate; після помилки
+        # решта черги лишається до наступної спроби. Повертає кількість змін.
+        if self.mirror is None:
+            return 0
+        owner = uuid.uuid4().hex
+        if not self._право_доставки(owner):
+            logging.info("Дзеркало Google Sheets: чергу вже доставляє інший процес")
+            return 0
+        try:
+            return self._доставити(owner, max_ops)
+        finally:
+            with self._lock, self.conn:
+                self.conn.execute('DELETE FROM mirror_lease WHERE owner = ?', (owner,))
+
+    def _доставити(self, owner, max_ops):
+        delivered = 0
+        while max_ops is None or delivered < max_ops:
+            if not self._право_доставки(owner):
+                logging.warning("Дзеркало Google Sheets: право на доставку перейшло до іншого процесу")
+                break
+            with self._lock:
+                pending = self.conn.execute('SELECT id, op FROM outbox ORDER BY id LIMIT 100').fetchall()
+            if not pending:
+                break
+            batch, ops, count = [], [], 0
+            for op_id, data in pending:
+                op = json.loads(data)
+                if ops and not (_дописування(ops[0]) and _дописування(op) and count < MIRROR_BATCH_ROWS):
+                    break
+                batch.append(op_id)
+                ops.append(op)
+                count += sum(len(rows) for rows in op.get('rows', {}).values())
+            first = ops[0]
+            try:
+                with етап('mirror'):
+                    if 'clear' in first:
+                        self.mirror.очистити(first['clear'])
+                    else:
+                        rows_by_sheet = {}
+                        for op in ops:
+                            for name, rows in op['rows'].items():
+                                rows_by_sheet.setdefault(name, []).extend(rows)
+                        sheet_ids = self.mirror.забезпечити_листи(list(rows_by_sheet) + _листи_запитів(first['requests']))
+                        self.mirror.записати(rows_by_sheet, _замінити_листи(first['requests'], sheet_ids))
+            except Exception as e:
+                logging.error(f"Дзеркало Google Sheets: не вдалося доставити зміни, лишилося в черзі {self.в_черзі()}: {e}")
+                лічильник('mirror_errors')
+                break
+            with self._lock, self.conn:
+                self.conn.executemany('DELETE FROM outbox WHERE id = ?', [(op_id,) for op_id in batch])
+            delivered += len(batch)
+            лічильник('mirror_ops', len(batch))
+        self.api_calls = self.mirror.api_calls
+        return delivered
+
+    def підготувати_ущільнення(self):
+        # Статуси змінюють /api/analyze і редактори в самій таблиці, тож перед
+        # ущільненням дзеркало доставляє чергу і підтягує колонку статусів.
+        # Номери рядків мають збігатися, інакше видалення влучило б не в ті рядки.
+        if self.mirror is None:
+            return
+        self.віддзеркалити()
+        if self.в_черзі():
+            raise RuntimeError("Черга дзеркала Google Sheets не порожня, ущільнення відкладено")
+        local, = self.прочитати(['Articles!A:A'])
+        remote, = self.mirror.прочитати(['Articles!A:B'])
+        if len(remote) != len(local):
+            raise RuntimeError(f"Лист Articles у Google Sheets ({len(remote)} рядків) розійшовся з локальним "
+                               f"({len(local)} рядків), ущільнення відкладено")
+        sheet_id = self.ідентифікатори_листів()['Articles']
+        with self._lock, self.conn:
+            for row, values in enumerate(remote):
+                status = values[1] if len(values) > 1 else ""
+                data = self.conn.execute('SELECT data FROM rows WHERE sheet = ? AND row = ?', (sheet_id, row)).fetchone()
+                if data is None:
+                    continue
+                cells = json.loads(data[0])
+                if len(cells) > 1 and cells[1] != status:
+                    cells[1] = status
+                    self.conn.execute('UPDATE rows SET data = ? WHERE sheet = ? AND row = ?',
+                                      (json.dumps(cells, ensure_ascii=False), sheet_id, row))
+
+    def експортувати(self, target='parquet', directory=None):
+        # Знімок усіх листів у файли (перший рядок листа — назви колонок)
+        directory = os.path.join(directory or EXPORT_DIR, datetime.now().strftime('%Y%m%d-%H%M%S'))
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name in self.ідентифікатори_листів():
+            rows, = self.прочитати([f"'{name}'"])
+            if not rows:
+                continue
+            paths.append(записати_файл(os.path.join(directory, name), rows[0], rows[1:], target))
+        return paths
+
+def _замінити_листи(value, sheet_ids):
+    # Запити batchUpdate посилаються на sheetId, а він свій у кожного сховища,
+    # тож у черзі лист позначається назвою: sheet_ids — {id: назва} при записі
+    # в чергу і {назва: id} при доставці
+    if isinstance(value, dict):
+        return {key: sheet_ids[item] if key == 'sheetId' else _замінити_листи(item, sheet_ids)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [_замінити_листи(item, sheet_ids) for item in value]
+    return value
+
+def _дописування(op):
+    return 'rows' in op and not op['requests']
+
+def _листи_запитів(value):
+    if isinstance(value, dict):
+        return [value['sheetId']] if 'sheetId' in value else [name for item in value.values() for name in _листи_запитів(item)]
+    if isinstance(value, list):
+        return [name for item in value for name in _листи_запитів(item)]
+    return []
+
+def відкрити_сховище():
+    # Контекст зі сховищем для запуску згідно з SCRAPE_STORAGE
+    spreadsheet_id = os.environ.get('SPREADSHEET_ID')
+    if STORAGE == 'sqlite':
+        return LocalStore(mirror=SheetsWriter(налаштувати_sheets, spreadsheet_id) if spreadsheet_id else None)
+    if STORAGE != 'sheets':
+        raise ValueError(f"Невідоме сховище SCRAPE_STORAGE={STORAGE}")
+    if not spreadsheet_id:
+        raise ValueError("Змінна середовища SPREADSHEET_ID не встановлена")
+    return contextlib.nullcontext(SheetsWriter(налаштувати_sheets, spreadsheet_id))
+
+def віддзеркалити_сховище():
+    # Окреме з'єднання з базою для фонового дзеркала (scraper.runtime)
+    if STORAGE != 'sqlite' or not os.environ.get('SPREADSHEET_ID'):
+        return 0
+    with відкрити_сховище() as store:
+        return store.віддзеркалити()
+
+async def після_запуску(store, runtime=None):
+    # Довгоживучий процес доставляє чергу дзеркала у фоні, а разовий запуск
+    # (CLI) — наприкінці, вже після скрапінгу
+    if getattr(store, 'mirror', None) is None:
+        return
+    if runtime is not None:
+        runtime.віддзеркалити()
+    else:
+        await у_потоці(None, store.віддзеркалити)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальне сховище статей: експорт і дзеркало Google Sheets")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="Знімок листів у Parquet або JSONL")
+    export.add_argument('--format', choices=['parquet', 'jsonl'], default='parquet')
+    export.add_argument('--dir', help="Каталог (за замовчуванням SCRAPE_EXPORT_DIR)")
+    commands.add_parser('mirror', help="Доставити чергу змін у Google Sheets")
+    args = parser.parse_args(argv)
+    with LocalStore(mirror=SheetsWriter(налаштувати_sheets, os.environ['SPREADSHEET_ID'])
+                    if args.command == 'mirror' else None) as store:
+        if args.command == 'export':
+            for path in store.експортувати(args.format, args.dir):
+                print(path)
+        else:
+            print(f"Доставлено {store.віддзеркалити()} змін, у черзі {store.в_черзі()}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())